@@ -0,0 +1,133 @@
+import asyncio
+import collections
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from src.metrics import admission_rejected
+
+MAX_TRACKED_TEAMS = 10_000
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=detail,
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class AdmissionController:
+    """
+    Admission layer in front of the signing and storing of submissions.
+
+    At most `max_in_flight` submissions are processed at once, up to `max_queue` more wait in FIFO order for at most
+    `queue_timeout` seconds. Each team_email may additionally start `team_rate` submissions per minute, with bursts
+    of up to `team_burst` (token bucket, disabled if team_rate is 0). Overflow is rejected right away with 429 (team
+    rate) or 503 (queue full or wait timed out) and a Retry-After estimated from the recent processing times.
+    The check endpoints do not pass through here, so they are never queued behind submissions.
+    """
+
+    def __init__(self, max_in_flight: int = 16, max_queue: int = 64, queue_timeout: float = 15,
+                 team_rate: float = 0, team_burst: int = 5):
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.team_rate = team_rate / 60  # tokens per second
+        self.team_burst = max(team_burst, 1)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = collections.deque()  # futures of queued submissions, possibly of different event loops
+        self._buckets = {}  # team_email -> (tokens, last update)
+        self._service_time = 1.0  # moving average of the processing time in seconds
+
+    def _take_token(self, team_email: str) -> float:
+        """Take a token of the team's bucket, returns 0 on success or the seconds until a token is available."""
+        if self.team_rate <= 0:
+            return 0
+        now = time.monotonic()
+        tokens, last = self._buckets.get(team_email, (self.team_burst, now))
+        tokens = min(self.team_burst, tokens + (now - last) * self.team_rate)
+        if tokens < 1:
+            self._buckets[team_email] = (tokens, now)
+            return (1 - tokens) / self.team_rate
+        self._buckets[team_email] = (tokens - 1, now)
+        if len(self._buckets) > MAX_TRACKED_TEAMS:
+            # teams whose bucket has refilled completely are indistinguishable from untracked ones
+            refill = self.team_burst / self.team_rate
+            self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < refill}
+        return 0
+
+    def _refund_token(self, team_email: str):
+        if self.team_rate > 0 and team_email in self._buckets:
+            tokens, last = self._buckets[team_email]
+            self._buckets[team_email] = (min(self.team_burst, tokens + 1), last)
+
+    def _estimated_wait(self) -> float:
+        return self._service_time * (len(self._waiters) + 1) / self.max_in_flight
+
+    def _release_slot(self):
+        """Hand the slot to the next queued submission or free it. Must hold the lock."""
+        if self._waiters:
+            future = self._waiters.popleft()
+            future.get_loop().call_soon_threadsafe(_wake, future)
+        else:
+            self._in_flight -= 1
+
+    async def acquire(self, team_email: str):
+        with self._lock:
+            wait = self._take_token(team_email)
+            if wait:
+                admission_rejected.inc(reason="team_rate")
+                raise _reject(429, "Too many submissions for this team_email. Please retry later.", wait)
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._refund_token(team_email)
+                admission_rejected.inc(reason="queue_full")
+                raise _reject(503, "Server is busy processing submissions. Please retry later.",
+                              self._estimated_wait())
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+
+        try:
+            await asyncio.wait({future}, timeout=self.queue_timeout)
+        except BaseException:
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                else:  # the slot was handed over meanwhile
+                    self._release_slot()
+            raise
+        with self._lock:
+            if future not in self._waiters:
+                return  # the slot was handed over, possibly just after the timeout
+            self._waiters.remove(future)
+            self._refund_token(team_email)
+            admission_rejected.inc(reason="queue_timeout")
+            raise _reject(503, "Server is busy processing submissions. Please retry later.", self._estimated_wait())
+
+    def release(self, duration: float):
+        with self._lock:
+            self._service_time = 0.8 * self._service_time + 0.2 * duration
+            self._release_slot()
+
+    @asynccontextmanager
+    async def admit(self, team_email: str):
+        """Hold a processing slot for the duration of the block, raises HTTPException 429/503 if rejected."""
+        await self.acquire(team_email)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": self._in_flight, "queued": len(self._waiters)}
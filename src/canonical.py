@@ -0,0 +1,32 @@
+import orjson
+
+# marks records whose submission_digest is the SHA-512 of the canonical JSON payload
+DIGEST_FORMAT = "canonical_json"
+
+
+def canonical_json(data) -> bytes:
+    """
+    Canonical JSON serialization of submission data, reproducible outside Python: UTF-8, keys sorted, no
+    whitespace, floats in their shortest round-trip representation.
+    """
+    return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+
+def splice_record(metadata: dict, payload: bytes) -> bytes:
+    """
+    Serialize a record consisting of the metadata and the keys of the canonical payload object without serializing
+    the payload (i.a. the answers) again. Metadata keys must not overlap with the payload keys.
+    """
+    return orjson.dumps(metadata)[:-1] + b"," + payload[1:]
+
+
+def record_payload(record: dict) -> bytes:
+    """
+    The bytes the submission_digest of a stored record was computed from: the canonical JSON payload, or the repr of
+    the submission's model_dump() for records stored before canonical digests (no digest_format).
+    """
+    payload = {"team_email": record["team_email"], "submission_name": record["submission_name"],
+               "answers": record["answers"]}
+    if record.get("digest_format") == DIGEST_FORMAT:
+        return canonical_json(payload)
+    return str(payload).encode("utf-8")
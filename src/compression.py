@@ -0,0 +1,71 @@
+"""
+Content negotiation and compression of responses. Brotli is used if the optional 'brotli' package is installed,
+gzip otherwise.
+"""
+import functools
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# payloads smaller than this are not worth the compression overhead
+MIN_SIZE = 1024
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The preferred supported encoding accepted by the client (RFC 9110 Accept-Encoding), None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+@functools.lru_cache(maxsize=16)
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compress data with the given encoding. Results are cached, so repeatedly served payloads (e.g. the unchanged
+    submissions table) are only compressed once.
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def encode_response(data: bytes, accept_encoding: Optional[str], etag: Optional[str] = None) -> tuple[bytes, dict]:
+    """
+    Compress data for the client, returns the body and the Content-Encoding, Vary and (encoding specific) ETag headers.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(data) >= MIN_SIZE else None
+    if encoding:
+        data = compress(data, encoding)
+        headers["Content-Encoding"] = encoding
+    if etag:
+        # each representation needs its own validator
+        headers["ETag"] = f'{etag[:-1]}-{encoding}"' if encoding else etag
+    return data, headers
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether the If-None-Match header of a request lists the ETag (or is '*')."""
+    tags = [tag.strip() for tag in (if_none_match or "").split(",")]
+    return etag in tags or "*" in tags
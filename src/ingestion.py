@@ -0,0 +1,145 @@
+import hashlib
+from typing import AsyncIterator, Callable
+
+from fastapi import HTTPException, Request, UploadFile
+from starlette.datastructures import Headers
+from starlette.requests import ClientDisconnect
+from starlette.responses import JSONResponse, StreamingResponse
+
+from src.metrics import stage_timer
+
+# allowance for multipart boundaries and part headers around the JSON payload
+ENVELOPE_OVERHEAD = 64 * 1024
+# percent-encoding in form bodies can inflate every byte of the JSON payload to three bytes
+URLENCODED_FACTOR = 3
+CHUNK_SIZE = 64 * 1024
+
+
+def body_limit(content_type: str, max_json_size: int) -> int:
+    """Max accepted request body size for a JSON payload of max_json_size bytes in the given encoding."""
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return URLENCODED_FACTOR * max_json_size + ENVELOPE_OVERHEAD
+    return max_json_size + ENVELOPE_OVERHEAD
+
+
+def payload_too_large(max_json_size: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"JSON payload too large. Max size is {max_json_size} bytes.")
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects oversized request bodies of the upload endpoints before they are buffered: up front if the declared
+    Content-Length exceeds the limit, otherwise as soon as the received body crosses it.
+    """
+
+    def __init__(self, app, paths: set[str], max_json_size: Callable[[], int]):
+        self.app = app
+        self.paths = paths
+        self.max_json_size = max_json_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        max_json_size = self.max_json_size()
+        limit = body_limit(headers.get("content-type", ""), max_json_size)
+        content_length = headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            error = payload_too_large(max_json_size)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code,
+                                    headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise payload_too_large(max_json_size)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def read_upload(file: UploadFile, max_size: int) -> tuple[bytes, str]:
+    """
+    Read the uploaded file in chunks, aborting as soon as it exceeds max_size.
+    Returns the content and its SHA-256 hex digest, computed incrementally while reading.
+    """
+    chunks, size = [], 0
+    hasher = hashlib.sha256()
+    with stage_timer("upload_read"):
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise payload_too_large(max_size)
+            hasher.update(chunk)
+            chunks.append(chunk)
+    return b"".join(chunks), hasher.hexdigest()
+
+
+def read_form_content(content: str, max_size: int) -> tuple[bytes, str]:
+    """Counterpart of read_upload for JSON payloads posted as form field."""
+    data = content.encode("utf-8")
+    if len(data) > max_size:
+        raise payload_too_large(max_size)
+    return data, hashlib.sha256(data).hexdigest()
+
+
+async def read_json_lines(request: Request, max_line_size: int) -> AsyncIterator[tuple[int, bytes | str]]:
+    """
+    The non-empty lines of a JSON Lines request body as (line number, content), each yielded as soon as it arrived,
+    so the body is never buffered as a whole. Lines longer than max_line_size are not buffered either, they are
+    yielded with the error message instead of the content.
+    """
+    parts, size, number = [], 0, 0
+
+    def complete_line() -> bytes | str | None:
+        """Ends the current line, returns its content (None if blank)."""
+        nonlocal parts, size, number
+        number += 1
+        if size > max_line_size:
+            content = payload_too_large(max_line_size).detail
+        else:
+            content = b"".join(parts).removesuffix(b"\r")
+        parts, size = [], 0
+        return content if isinstance(content, str) or content.strip() else None
+
+    async for chunk in request.stream():
+        *complete, rest = chunk.split(b"\n")
+        for part in complete:
+            size += len(part)
+            if size <= max_line_size:
+                parts.append(part)
+            content = complete_line()
+            if content is not None:
+                yield number, content
+        size += len(rest)
+        if size <= max_line_size:
+            parts.append(rest)
+    if size:
+        content = complete_line()
+        if content is not None:
+            yield number, content
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose content is generated while the request body is still being read. Starlette's
+    StreamingResponse listens for the client disconnecting on ASGI servers before spec 2.4 (uvicorn), which would
+    consume the body chunks; here a disconnect surfaces when reading the body or sending the response.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
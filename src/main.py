@@ -1,41 +1,131 @@
+import asyncio
+import contextlib
+import datetime
+import functools
 import json
 import os
 import re
 import logging
 import hashlib
-from fastapi import FastAPI, Form, HTTPException, UploadFile, Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+import math
+import secrets
+import signal
+import threading
+from urllib.parse import urlencode
+from fastapi import Depends, FastAPI, Form, Header, HTTPException, Query, UploadFile, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, ValidationError, Field, ConfigDict
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from typing import Optional, List, Union, Literal
-from tsp_client import TSPSigner, TSPVerifier, SigningSettings
 from dotenv import load_dotenv
+from src.admission import AdmissionController
+from src.canonical import DIGEST_FORMAT, canonical_json, record_payload
+from src.compression import encode_response, etag_matches
+from src.ingestion import (DuplexStreamingResponse, UploadSizeLimitMiddleware, read_form_content, read_json_lines,
+                           read_upload)
+from src.merkle import MerkleBatcher
+from src.metrics import MetricsMiddleware, duplicate_submissions, registry, sample_stacks, stage_timer, tsp_errors
+from src.questions import QuestionCatalogue, ReloadableQuestions
+from src.scoring import GoldAnswers, Leaderboard
+from src.settings import get_settings, reload_settings
+from src.signing import TSPSigningPool, TSPTimeoutError
+from src.static_files import PrecompressedStaticFiles
+from src.storage import open_store
+from src.submissions_index import SubmissionsIndex
+from src.validation_cache import ValidationCache
+from src.verification import verify_record
 
 # TODO set env variables!
 
-app = FastAPI()
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    refresher = asyncio.create_task(refresh_submission_streams())
+    end_streams_on_exit_signals(asyncio.get_running_loop())
+    yield
+    end_streams()
+    refresher.cancel()
+    # the server stopped accepting connections and waited for running requests, finish the signings left over
+    if merkle_batcher:
+        await merkle_batcher.drain()
+    await run_in_threadpool(signing_pool.shutdown)
+
+
+app = FastAPI(lifespan=lifespan)
 load_dotenv()
-DEV = os.getenv("DEVELOPMENT")
+settings = get_settings()
+DEV = settings.development
 
 if DEV:
     logger = logging.getLogger(__name__)
-    if not os.path.exists('temp'):
-        os.makedirs('temp')
-    logging.basicConfig(filename='temp/debug.log', encoding='utf-8', level=logging.INFO)
-
-app.mount("/static", StaticFiles(directory="src/static"), name="static")
+    os.makedirs('temp', exist_ok=True)  # workers may start at the same time
+    logging.basicConfig(filename='temp/debug.log', encoding='utf-8', level=logging.INFO,
+                        format="%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s")
+
+static_files = PrecompressedStaticFiles("src/static")
+app.mount("/static", static_files, name="static")
+app.add_middleware(UploadSizeLimitMiddleware,
+                   paths={"/check-submission", "/check-submission-ui", "/submit", "/submit-ui"},
+                   max_json_size=lambda: get_settings().max_json_size)
+app.add_middleware(UploadSizeLimitMiddleware, paths={"/check-submissions"},
+                   max_json_size=lambda: get_settings().max_json_size * get_settings().check_batch_size)
+app.add_middleware(MetricsMiddleware)  # outermost, so rejected uploads are counted too
 templates = Jinja2Templates(directory="src/")
-
-with open(os.getenv("CORRECT_QUESTIONS_PATH"), "r", encoding="utf-8") as f:
-    true_questions = json.load(f)
+templates.env.globals["static_url"] = static_files.url
+
+questions = ReloadableQuestions(settings.correct_questions_path)
+if settings.questions_reload_interval > 0:
+    questions.watch(settings.questions_reload_interval)
+
+validation_cache = ValidationCache(max_entries=settings.validation_cache_size, ttl=settings.validation_cache_ttl)
+admission = AdmissionController(max_in_flight=settings.submit_max_in_flight,
+                                max_queue=settings.submit_queue_size,
+                                queue_timeout=settings.submit_queue_timeout,
+                                team_rate=settings.submit_team_rate,
+                                team_burst=settings.submit_team_burst)
+
+registry.register_collector(lambda: [
+    "# HELP rag_submissions_in_flight Submissions being signed and stored",
+    "# TYPE rag_submissions_in_flight gauge",
+    f"rag_submissions_in_flight {admission.stats()['in_flight']}",
+    "# HELP rag_submissions_queued Submissions waiting for admission",
+    "# TYPE rag_submissions_queued gauge",
+    f"rag_submissions_queued {admission.stats()['queued']}",
+    "# HELP rag_validation_cache_requests_total Validation cache lookups per result",
+    "# TYPE rag_validation_cache_requests_total counter",
+    f'rag_validation_cache_requests_total{{result="hit"}} {validation_cache.hits}',
+    f'rag_validation_cache_requests_total{{result="miss"}} {validation_cache.misses}',
+])
+
+submission_store = open_store(settings.storage_backend, settings.submissions_path)
+submissions_index = SubmissionsIndex(submission_store)
+submissions_index.refresh()
+
+# optional: scoring against the gold answers, the leaderboard is updated with every new submission
+leaderboard = None
+if settings.gold_answers_path:
+    leaderboard = Leaderboard(submission_store, GoldAnswers.load(settings.gold_answers_path, questions.catalogue))
+    submissions_index.subscribe(leaderboard.notify)
+
+signing_pool = TSPSigningPool(tsp_url=settings.tsp_url,
+                              max_concurrency=settings.tsp_max_concurrency,
+                              timeout=settings.tsp_timeout,
+                              ca_pem_file=settings.tsp_ca_file)
+
+# optional: timestamp the Merkle root of all submissions arriving within the batch window with a single TSP token
+merkle_batcher = None
+if settings.tsp_batch_window > 0:
+    merkle_batcher = MerkleBatcher(signing_pool, window=settings.tsp_batch_window, max_size=settings.tsp_batch_size)
 
 
 class SourceReference(BaseModel):
     model_config = ConfigDict(extra='ignore')
 
     pdf_sha1: str = Field(..., description="SHA1 hash of the PDF file")
-    page_index: int = Field(..., description="Physical page number in the PDF file")
+    # stored records are read back with orjson, which only keeps 64-bit integers exact
+    page_index: int = Field(..., ge=0, le=2**63 - 1, description="Physical page number in the PDF file")
 
 
 class Answer(BaseModel):
@@ -63,33 +153,37 @@ def is_valid_email(email: str) -> bool:
     return re.match(email_pattern, email) is not None
 
 
-def validate_answer_item(submission: AnswerSubmission) -> tuple[list, list]:
+def validate_answer_item(submission: AnswerSubmission, catalogue: QuestionCatalogue, matches: list[Optional[int]],
+                         unknown: list[int], duplicates: list[int], missing: list[int]) -> tuple[list, list]:
     issues_questions = []
     issues_kind = []
-    questions_missing, kinds_missing = False, False
-    for idx, (true_item, submission_item) in enumerate(zip(true_questions, submission.answers)):
-        if submission_item.question_text:
-            true_question = re.sub(r'[^A-Za-z0-9]', '', true_item["text"].lower())
-            submitted_question = re.sub(r'[^A-Za-z0-9]', '', submission_item.question_text.lower())
-            if true_question != submitted_question:
-                issues_questions.append(
-                    f"\n - Question mismatch (index {idx}): '{submission_item.question_text}' != '{true_item['text']}'")
-        else:
-            questions_missing = True
-
-        # if submission_item.kind:
-        #     true_kind = true_item["kind"]
-        #     submitted_kind = submission_item.kind
-        #     if true_kind != submitted_kind:
-        #         issues_kind.append(
-        #             f"\n - Kind mismatch (index {idx}): '{submission_item.kind}' != '{true_item['kind']}'")
-        # else:
-        #     kinds_missing = True
+    questions_missing = any(not item.question_text for item in submission.answers)
+
+    if missing:
+        idx = missing[0]
+        issues_questions.append(f"\n - Missing answers for {len(missing)} of {len(catalogue)} questions "
+                                f"(e.g. index {idx}: '{catalogue[idx]['text']}')")
+    for idx in unknown:
+        issues_questions.append(
+            f"\n - Unknown question (answer index {idx}): '{submission.answers[idx].question_text}'")
+    for idx in duplicates:
+        issues_questions.append(f"\n - Duplicate answer (answer index {idx}) for an already answered question")
+
+    # for idx, (question_idx, submission_item) in enumerate(zip(matches, submission.answers)):
+    #     if question_idx is None:
+    #         continue
+    #     if submission_item.kind:
+    #         true_kind = catalogue[question_idx]["kind"]
+    #         if true_kind != submission_item.kind:
+    #             issues_kind.append(
+    #                 f"\n - Kind mismatch (index {idx}): '{submission_item.kind}' != '{true_kind}'")
+    #     else:
+    #         kinds_missing = True
 
     if questions_missing:
-        issues_questions.insert(0, "\n - Missing question_text. To validate that answers are in correct order like in "
-                                "questions.json and aligned with correct answers, consider also adding 'question_text' "
-                                "to the answer items.")
+        issues_questions.insert(0, "\n - Missing question_text. Answers without 'question_text' are matched to the "
+                                "questions by their position in questions.json. To validate that answers are aligned "
+                                "with correct answers, consider also adding 'question_text' to the answer items.")
     # if kinds_missing:
     #     issues_kind.append("\n - Missing kind. To validate answers kind corresponding to questions, consider "
     #                        "also adding 'kind' to the answer items.")
@@ -98,6 +192,14 @@ def validate_answer_item(submission: AnswerSubmission) -> tuple[list, list]:
 
 
 def validate_answer(kind: str, answer: any) -> tuple[any, Optional[str]]:
+    corrected, issue = _validate_answer(kind, answer)
+    if isinstance(corrected, float) and not math.isfinite(corrected):
+        # not representable in JSON, the signed payload would differ from the submitted one
+        raise HTTPException(status_code=400, detail=f"Expected a finite number, got: '{answer}'")
+    return corrected, issue
+
+
+def _validate_answer(kind: str, answer: any) -> tuple[any, Optional[str]]:
     if answer is None:
         return "N/A", None
     if isinstance(answer, str) and answer.lower() in ["n/a", "na", "nan", ""]:
@@ -132,11 +234,14 @@ def validate_answer(kind: str, answer: any) -> tuple[any, Optional[str]]:
     return answer, None
 
 
-def validate_submission(submission: AnswerSubmission) -> list:
+def validate_submission(submission: AnswerSubmission, catalogue: Optional[QuestionCatalogue] = None) -> list:
+    settings = get_settings()
+    # same catalogue for the whole validation, even if reloaded meanwhile
+    catalogue = questions.catalogue if catalogue is None else catalogue
     issues_questions = []
     issues_kind = []
     k_issues_to_show = 2
-    if DEV: logger.info(f"CHECK_QUESTIONS: {os.getenv('CHECK_QUESTIONS')}")
+    if DEV: logger.info(f"CHECK_QUESTIONS: {settings.check_questions}")
 
     # checking email address
     if is_valid_email(submission.team_email):
@@ -144,8 +249,11 @@ def validate_submission(submission: AnswerSubmission) -> list:
     else:
         issue_email = ["\n - INVALID EMAIL ADDRESS! \n"]
 
-    if os.getenv("CHECK_QUESTIONS") == "True":
-        issues_questions, issues_kind = validate_answer_item(submission)
+    matches, unknown, duplicates, missing = catalogue.match([item.question_text for item in submission.answers])
+
+    if settings.check_questions:
+        issues_questions, issues_kind = validate_answer_item(submission, catalogue, matches, unknown, duplicates,
+                                                             missing)
         if len(issues_questions) > k_issues_to_show:
             issues_questions = issues_questions[:k_issues_to_show] + [
                 f"\n - ... and {len(issues_questions) - k_issues_to_show} more question mismatches"]
@@ -154,8 +262,10 @@ def validate_submission(submission: AnswerSubmission) -> list:
                 f"\n - ... and {len(issues_kind) - k_issues_to_show} more kind mismatches"]
 
     issues_answers = []
-    for idx, (true_item, submission_item) in enumerate(zip(true_questions, submission.answers)):
-        corrected_value, issue = validate_answer(true_item["kind"], submission_item.value)
+    for idx, (question_idx, submission_item) in enumerate(zip(matches, submission.answers)):
+        # unmatched answers can only be validated against the kind they state themselves
+        kind = catalogue[question_idx]["kind"] if question_idx is not None else submission_item.kind
+        corrected_value, issue = validate_answer(kind, submission_item.value)
         submission.answers[idx].value = corrected_value
         if issue:
             issue = f"\n - Answer index {idx}: {issue}"
@@ -170,31 +280,65 @@ def validate_submission(submission: AnswerSubmission) -> list:
 
 def get_submission_schema(content: str | bytes) -> AnswerSubmission:
     try:
-        if len(content) > int(os.getenv("MAX_JSON_SIZE")):
-            raise HTTPException(status_code=413,
-                                detail=f"JSON payload too large. Max size is {os.getenv('MAX_JSON_SIZE')} bytes.")
-
-        data = json.loads(content)
-        return AnswerSubmission(**data)
-    except (json.JSONDecodeError, ValidationError) as e:
+        max_json_size = get_settings().max_json_size
+        if len(content) > max_json_size:
+            raise HTTPException(status_code=413, detail=f"JSON payload too large. Max size is {max_json_size} bytes.")
+
+        # parse and validate the raw bytes in a single pass
+        with stage_timer("parse"):
+            return AnswerSubmission.model_validate_json(content)
+    except ValidationError as e:
         raise HTTPException(status_code=400, detail=f"Invalid JSON or schema: {str(e)}")
 
 
-def sign_with_tsp_server(submission: AnswerSubmission) -> [str, str, str]:
-    submission_bytes = str(submission.model_dump()).encode("utf-8")
-    digest = hashlib.sha512(submission_bytes).digest()
+def parse_and_validate(content: bytes, payload_hash: str,
+                       catalogue: Optional[QuestionCatalogue] = None) -> tuple[AnswerSubmission, list]:
+    """Parse and validate the payload, reusing the result of an earlier check of the identical bytes."""
+    catalogue = questions.catalogue if catalogue is None else catalogue
+    context = (catalogue, get_settings().check_questions)
+    cached = validation_cache.get(payload_hash, context)
+    if cached:
+        return cached
+    submission = get_submission_schema(content)
+    with stage_timer("validate"):
+        issues = validate_submission(submission, catalogue)
+    validation_cache.put(payload_hash, context, (submission, issues))
+    return submission, issues
 
-    signer = TSPSigner()
 
-    if os.getenv("TSP_URL"):
-        if DEV: logger.info("Signing with specified TSP server...")
-        signing_settings = SigningSettings(tsp_server=os.getenv("TSP_URL"))
-        signature = signer.sign(message_digest=digest, signing_settings=signing_settings)
-    else:
-        if DEV: logger.info("Signing with default TSP server...")
-        signature = signer.sign(message_digest=digest)
+def secret_matches(given: str, expected: str) -> bool:
+    """Constant-time comparison, compare_digest only accepts ASCII strings."""
+    return secrets.compare_digest(given.encode("utf-8"), expected.encode("utf-8"))
+
+
+def check_token_matches(check_token: Optional[str], payload_hash: str):
+    if check_token and not secret_matches(check_token, payload_hash):
+        raise HTTPException(status_code=400, detail="check_token does not match the submitted payload. "
+                                                    "Check the submission again before submitting.")
 
-    verified = TSPVerifier().verify(signature, message_digest=digest)
+
+async def sign_with_tsp_server(submission_bytes: bytes) -> [str, str, str, Optional[dict]]:
+    """
+    Timestamps the digest of the canonical submission bytes. In batching mode the TSP token covers the Merkle root
+    of the batch and the Merkle root and inclusion proof of the submission are returned as well.
+    """
+    digest = hashlib.sha512(submission_bytes).digest()
+
+    if DEV: logger.info(f"Signing with {signing_pool.tsp_url or 'default'} TSP server...")
+    merkle = None
+    try:
+        # includes waiting for a free signing worker or the batch window
+        with stage_timer("tsp_sign"):
+            if merkle_batcher:
+                signature, verified, merkle = await merkle_batcher.sign(digest)
+            else:
+                signature, verified = await signing_pool.sign(digest)
+    except TSPTimeoutError:
+        tsp_errors.inc(kind="timeout")
+        raise HTTPException(status_code=504, detail="TSP server did not respond in time. Please try again.")
+    except Exception as e:
+        tsp_errors.inc(kind=type(e).__name__)
+        raise
 
     if DEV:
         logger.info("Signature verification:")
@@ -202,44 +346,181 @@ def sign_with_tsp_server(submission: AnswerSubmission) -> [str, str, str]:
         logger.info("")
         logger.info(verified.signed_attrs)  # Parsed CMS SignedAttributes structure
 
-    return signature.hex(), digest.hex(), verified.tst_info["gen_time"].strftime("%Y-%m-%d, %H:%M:%S")
+    return signature.hex(), digest.hex(), verified.tst_info["gen_time"].strftime("%Y-%m-%d, %H:%M:%S"), merkle
 
 
-def store_submission(submission: AnswerSubmission, signature: str, tsp_signature: str, digest: str, timestamp: str):
-    """Store a submission record as JSON locally in SUBMISSIONS_PATH."""
-    record = {
-        "submission_name": submission.submission_name,
-        "team_email": submission.team_email,
+def store_submission(submission: AnswerSubmission, payload: bytes, signature: str, tsp_signature: str, digest: str,
+                     timestamp: str, merkle: Optional[dict] = None) -> dict:
+    """
+    Append a submission record to the submission store. The record consists of the metadata and the canonical
+    payload (team_email, submission_name, answers) the digest was computed from. Returns the metadata.
+    """
+    metadata = {
         "time": timestamp,
         "signature": signature,
         "tsp_signature": tsp_signature,
         "submission_digest": digest,
-        "answers": submission.model_dump()["answers"],
+        "digest_format": DIGEST_FORMAT,
+        **(merkle or {}),
     }
-    clean_timestamp = timestamp.replace(":", "-").replace(", ", "-")
+    with stage_timer("store"):
+        row = submission_store.add(metadata, payload, submission.team_email, submission.submission_name)
+    submissions_index.add(row)
+    return metadata
+
+
+def tsp_verification_data(timestamp: str, submission_digest: str, tsp_signature: str, merkle: Optional[dict],
+                          payload: bytes) -> dict:
+    """Everything needed to verify a submission with the TSP independently of this server."""
+    return {"timestamp": timestamp, "submission_digest": submission_digest, "tsp_signature": tsp_signature,
+            **(merkle or {}), "submission": payload.decode("utf-8")}
+
 
-    with open(os.path.join(os.getenv("SUBMISSIONS_PATH"), f"{clean_timestamp}_{record['signature'][:64]}.json"), "w",
-              encoding="utf-8") as f:
-        json.dump(record, f, indent=4)
+def submission_receipt(record: dict, payload: bytes, verification_data: bool = False) -> dict:
+    """
+    Compact receipt of a stored submission, the verification data is served by /receipts/{signature} (or included
+    if verification_data is set).
+    """
+    receipt = {
+        "submission_name": record["submission_name"],
+        "time": record["time"],
+        "signature": record["signature"],  # only publish first 64 characters
+        "submission_digest": record["submission_digest"],
+        # the digest is only known to the submitter, it authorizes fetching the verification data
+        "receipt_url": f"/receipts/{record['signature']}?{urlencode({'digest': record['submission_digest']})}",
+    }
+    if verification_data:
+        merkle = {k: record[k] for k in ("merkle_root", "merkle_proof") if k in record}
+        receipt["tsp_verification_data"] = tsp_verification_data(record["time"], record["submission_digest"],
+                                                                  record["tsp_signature"], merkle, payload)
+    return receipt
+
+
+async def sign_and_store(submission: AnswerSubmission, payload: bytes) -> dict:
+    """Generates a signature and stores the submission in the database, returns the metadata of the record."""
+    tsp_signature, submission_digest, timestamp, merkle = await sign_with_tsp_server(payload)
+    if merkle:
+        # the TSP token is shared by the whole batch, the digest makes the signature unique per submission
+        signature = hashlib.sha256((tsp_signature + submission_digest).encode("utf-8")).hexdigest()[:64]
+    else:
+        signature = hashlib.sha256(tsp_signature.encode("utf-8")).hexdigest()[:64]
+    metadata = await run_in_threadpool(store_submission, submission, payload, signature, tsp_signature,
+                                       submission_digest, timestamp, merkle)
+    return {**metadata, "submission_name": submission.submission_name}
 
 
-def process_submission(submission: AnswerSubmission) -> dict:
-    """Generates a signature and stores the submission in the database."""
-    tsp_signature, submission_digest, timestamp = sign_with_tsp_server(submission)
-    signature = hashlib.sha256(tsp_signature.encode("utf-8")).hexdigest()[:64]
-    store_submission(submission, signature, tsp_signature, submission_digest, timestamp)
+def find_duplicate(submission: AnswerSubmission, digest: str, window: float) -> Optional[dict]:
+    """
+    The stored record of an identical submission from the last `window` seconds. Only the team's latest submission
+    of the name counts: submitting an earlier version again makes it the current one, so it is signed again.
+    """
+    record = submission_store.find(digest, submission.team_email, submission.submission_name)
+    if record is None:
+        return None
+    current = submissions_index.current(submission.team_email, submission.submission_name)
+    if current is None or current["signature"] != record["signature"]:
+        return None
+    signed_at = datetime.datetime.strptime(record["time"], "%Y-%m-%d, %H:%M:%S").replace(tzinfo=datetime.timezone.utc)
+    if (datetime.datetime.now(datetime.timezone.utc) - signed_at).total_seconds() > window:
+        return None
+    return record
+
+
+# submission digest -> task signing and storing the submission, identical submissions wait for it instead of signing
+_in_flight = {}
+
+
+async def find_or_sign(submission: AnswerSubmission, payload: bytes, digest: str, window: float) -> dict:
+    """The record of an identical submission from the last `window` seconds, else signs and stores the submission."""
+    record = await run_in_threadpool(find_duplicate, submission, digest, window)
+    if record:
+        duplicate_submissions.inc(kind="stored")
+        return record
+    return await sign_and_store(submission, payload)
+
+
+def _finish_in_flight(digest: str, task: asyncio.Task):
+    del _in_flight[digest]
+    if not task.cancelled():
+        task.exception()  # re-raised by the waiting submissions, not an unretrieved exception
+
+
+async def process_submission(submission: AnswerSubmission, verification_data: bool = False) -> dict:
+    """
+    Signs and stores a submission within an admission slot and returns its receipt. Repeating an identical
+    submission within SUBMIT_DEDUP_WINDOW seconds (a retry, a double click) returns the receipt of the original
+    without signing or storing it again. Identical submissions arriving while the first is being signed wait for its
+    signing without taking an admission slot, cancelling one of them does not cancel the signing the others wait for.
+    """
+    payload = canonical_json(submission.model_dump())  # the only serialization of the answers
+    window = get_settings().submit_dedup_window
+    digest = hashlib.sha512(payload).hexdigest()
+    shared = _in_flight.get(digest) if window > 0 else None
+    if shared is None:
+        async with admission.admit(submission.team_email):
+            if window <= 0:
+                return submission_receipt(await sign_and_store(submission, payload), payload, verification_data)
+            # an identical submission may have been admitted while this one waited
+            shared = _in_flight.get(digest)
+            if shared is None:
+                task = _in_flight[digest] = asyncio.create_task(find_or_sign(submission, payload, digest, window))
+                task.add_done_callback(functools.partial(_finish_in_flight, digest))
+                record = await asyncio.shield(task)
+                return submission_receipt(record, payload, verification_data)
+    duplicate_submissions.inc(kind="in_flight")
+    record = await asyncio.shield(shared)
+    return submission_receipt(record, payload, verification_data)
+
+
+def verification_bundle(record: dict) -> dict:
+    """
+    Verification data of a stored submission, with the result of recomputing its digest (and Merkle root) and
+    verifying the TSP token against the configured trust roots.
+    """
+    merkle = {k: record[k] for k in ("merkle_root", "merkle_proof") if k in record}
     return {
-        "submission_name": submission.submission_name,
-        "time": timestamp,
-        "signature": signature,  # only publish first 64 characters
-        "tsp_verification_data": {"timestamp": timestamp, "submission_digest": submission_digest,
-                                  "tsp_signature": tsp_signature, "submission": str(submission.model_dump())},
+        "submission_name": record["submission_name"],
+        "time": record["time"],
+        "signature": record["signature"],
+        "tsp_verification_data": tsp_verification_data(record["time"], record["submission_digest"],
+                                                       record["tsp_signature"], merkle, record_payload(record)),
+        "verification": verify_record(record, signing_pool.verify),
     }
 
 
+def is_admin(authorization: Optional[str]) -> bool:
+    token = get_settings().admin_token
+    return bool(token) and secret_matches(authorization or "", f"Bearer {token}")
+
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Admin endpoints require 'Authorization: Bearer <ADMIN_TOKEN>' and are disabled if no ADMIN_TOKEN is set."""
+    if not is_admin(authorization):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+
+_index_cache = {}
+
+
+def render_index() -> tuple[bytes, str]:
+    """index.html with content-hashed asset URLs and its ETag, rendered again only after a static file changed."""
+    generation = static_files.generation
+    if generation not in _index_cache:
+        body = templates.get_template("index.html").render().encode("utf-8")
+        _index_cache.clear()
+        _index_cache[generation] = body, f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+    return _index_cache[generation]
+
+
 @app.get("/", response_class=HTMLResponse)
 async def serve_index(request: Request):
-    return templates.TemplateResponse(request, "index.html")
+    """The UI page, rendered once and revalidated by the browser with its ETag."""
+    payload, etag = render_index()
+    body, headers = encode_response(payload, request.headers.get("accept-encoding"), etag)
+    headers["Cache-Control"] = "no-cache"
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
 
 
 @app.post("/check-submission")
@@ -247,38 +528,131 @@ async def check_submission(file: UploadFile):
     if not file.filename.endswith('.json'):
         raise HTTPException(status_code=400, detail="Uploaded file must be a JSON file.")
     try:
-        content = await file.read()
+        content, payload_hash = await read_upload(file, get_settings().max_json_size)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-    submission = get_submission_schema(content)
-    issues = validate_submission(submission)
+    submission, issues = parse_and_validate(content, payload_hash)
 
     if issues:
-        return {"status": "issues found", "issues": issues}
+        return {"status": "issues found", "issues": issues, "check_token": payload_hash}
     else:
         return {"status": "valid submission",
-                "message": "No issues with submission file found. Ready to submit via /submit endpoint"}
+                "message": "No issues with submission file found. Ready to submit via /submit endpoint",
+                "check_token": payload_hash}
 
 
 @app.post("/check-submission-ui")
 async def check_submission(content: str = Form(...)):
-    submission = get_submission_schema(content)
-    issues = validate_submission(submission)
+    content, payload_hash = read_form_content(content, get_settings().max_json_size)
+    submission, issues = parse_and_validate(content, payload_hash)
+    if issues:
+        return {"status": "issues found", "issues": issues, "check_token": payload_hash}
+    return {"status": "valid submission", "check_token": payload_hash}
+
+
+def check_payload(content: bytes, catalogue: QuestionCatalogue) -> dict:
+    """Validation result of one payload of a batch, errors are reported instead of raised."""
+    payload_hash = hashlib.sha256(content).hexdigest()
+    try:
+        submission, issues = parse_and_validate(content, payload_hash, catalogue)
+    except HTTPException as e:
+        return {"status": "invalid", "detail": e.detail}
     if issues:
-        return {"status": "issues found", "issues": issues}
-    return {"status": "valid submission"}
+        return {"status": "issues found", "issues": issues, "check_token": payload_hash}
+    return {"status": "valid submission", "check_token": payload_hash}
+
+
+@app.post("/check-submissions")
+async def check_submissions(request: Request):
+    """
+    Check many submissions in one request, uploaded as multiple files (multipart field 'files') or as JSON Lines
+    body (one submission per line). One JSON result per input is streamed back as JSON Lines as soon as it is
+    validated, all inputs are validated against the same question catalogue. JSON Lines are read as they arrive, a
+    line beyond the batch size ends the results with an error line.
+    """
+    max_inputs = get_settings().check_batch_size
+    catalogue = questions.catalogue
+
+    def result_line(index: int, name: Optional[str], result: dict) -> bytes:
+        return json.dumps({"index": index, "name": name, **result}, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    async def results(inputs):
+        index = 0
+        try:
+            async for name, content in inputs:
+                if index == max_inputs:
+                    detail = f"Too many submissions. Max is {max_inputs} per request."
+                    yield result_line(index, name, {"status": "invalid", "detail": detail})
+                    return
+                if isinstance(content, str):
+                    result = {"status": "invalid", "detail": content}
+                else:
+                    result = await run_in_threadpool(check_payload, content, catalogue)
+                yield result_line(index, name, result)
+                index += 1
+        except HTTPException as e:  # the body crossed the size limit of the request
+            yield result_line(index, None, {"status": "invalid", "detail": e.detail})
+
+    no_inputs = HTTPException(status_code=400, detail="No submissions found. Upload files as 'files' or send one "
+                                                       "submission per line (JSON Lines).")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        # each line is validated and sent back before the next one is read
+        lines = read_json_lines(request, get_settings().max_json_size)
+        first = await anext(lines, None)
+        if first is None:
+            raise no_inputs
+
+        async def json_lines():
+            number, content = first
+            yield f"line {number}", content
+            async for number, content in lines:
+                yield f"line {number}", content
+
+        return DuplexStreamingResponse(results(json_lines()), media_type="application/x-ndjson")
+
+    inputs = []  # (name, content or error message)
+    try:
+        async with request.form(max_files=max_inputs) as form:
+            for file in form.getlist("files"):
+                if isinstance(file, str):  # not a file upload
+                    continue
+                if not file.filename.endswith(".json"):
+                    inputs.append((file.filename, "Uploaded file must be a JSON file."))
+                    continue
+                try:
+                    content, _ = await read_upload(file, get_settings().max_json_size)
+                    inputs.append((file.filename, content))
+                except HTTPException as e:
+                    inputs.append((file.filename, e.detail))
+    except StarletteHTTPException as e:
+        # the form parser rejects the file beyond max_files with its own 400
+        if e.status_code == 400 and str(e.detail).startswith("Too many files"):
+            raise HTTPException(status_code=413,
+                                detail=f"Too many submissions. Max is {max_inputs} per request.") from e
+        raise
+    if not inputs:
+        raise no_inputs
+
+    async def uploaded():
+        for upload in inputs:
+            yield upload
+
+    return StreamingResponse(results(uploaded()), media_type="application/x-ndjson")
 
 
 @app.post("/submit")
-async def submit(file: UploadFile):
+async def submit(file: UploadFile, check_token: Optional[str] = Form(None),
+                 verification_data: bool = Query(False, description="Include the TSP verification data inline")):
     if not file.filename.endswith('.json'):
         raise HTTPException(status_code=400, detail="Uploaded file must be a JSON file.")
     try:
-        content = await file.read()
-        submission = get_submission_schema(content)
-        issues = validate_submission(submission)  # Parse and validate form input
-        response = process_submission(submission)
+        content, payload_hash = await read_upload(file, get_settings().max_json_size)
+        check_token_matches(check_token, payload_hash)
+        submission, issues = parse_and_validate(content, payload_hash)  # Parse and validate form input
+        response = await process_submission(submission, verification_data)
 
         if issues:
             return {"status": "issues found",
@@ -292,15 +666,19 @@ async def submit(file: UploadFile):
             return {"status": "success",
                     "message": "Successfully submitted! Verify on submissions table and/or with TSP!",
                     "response": response}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
 @app.post("/submit-ui")
-async def submit_ui(content: str = Form(...)):
-    submission = get_submission_schema(content)
-    issues = validate_submission(submission)
-    response = process_submission(submission)
+async def submit_ui(content: str = Form(...), check_token: Optional[str] = Form(None),
+                    verification_data: bool = Query(False, description="Include the TSP verification data inline")):
+    content, payload_hash = read_form_content(content, get_settings().max_json_size)
+    check_token_matches(check_token, payload_hash)
+    submission, issues = parse_and_validate(content, payload_hash)
+    response = await process_submission(submission, verification_data)
     if issues:
         return {"status": "issues found",
                 "message": "Successfully submitted! However, issues with submission file were detected. "
@@ -314,19 +692,233 @@ async def submit_ui(content: str = Form(...)):
                 "response": response}
 
 
+MAX_PAGE_SIZE = 1000
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[tuple[str, str]]:
+    """Cursors are '<time>,<signature>' of the last row of the previous page (the time itself contains a comma)."""
+    if not cursor:
+        return None
+    time, sep, signature = cursor.rpartition(",")
+    if not sep or not time or not signature:
+        raise HTTPException(status_code=400, detail="Invalid cursor, expected '<time>,<signature>'.")
+    return time, signature
+
+
 @app.get("/submissions")
-def get_submissions():
+def get_submissions(request: Request,
+                    after: Optional[str] = Query(None, description="Cursor '<time>,<signature>' of the previous page"),
+                    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                    name_prefix: Optional[str] = Query(None, description="Prefix of the submission_name"),
+                    start: Optional[str] = Query(None, description="Earliest time, e.g. '2025-02-27, 10:00:00'"),
+                    end: Optional[str] = Query(None, description="Latest time (inclusive), a date includes the "
+                                                                 "whole day"),
+                    since: Optional[str] = Query(None, description="Rows added or overwritten since this time "
+                                                                   "(inclusive), overwritten rows in 'replaces'")):
+    """
+    Return the submissions as JSON (newest first) so the frontend can dynamically load them and populate the table.
+    Without parameters the whole table is returned. Pages are requested with `limit` and the cursor of the `Link`
+    header. Unchanged polls are answered with 304, responses are compressed if the client accepts it.
+    """
+    headers = {"Cache-Control": "no-cache"}
+    if after or limit or name_prefix or start or end or since:
+        rows, next_cursor = submissions_index.query(parse_cursor(after), limit, name_prefix, start, end, since)
+        payload = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = submissions_index.make_etag(payload)
+        if next_cursor:
+            params = {**request.query_params, "after": ",".join(next_cursor)}
+            headers["Link"] = f'<{request.url.path}?{urlencode(params)}>; rel="next"'
+    else:
+        payload, etag = submissions_index.snapshot()
+
+    body, encoding_headers = encode_response(payload, request.headers.get("accept-encoding"), etag)
+    headers.update(encoding_headers)
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/receipts/{signature}")
+async def get_receipt(signature: str, digest: Optional[str] = None, authorization: Optional[str] = Header(None)):
+    """
+    Full verification bundle of a submission (canonical payload, TSP token, Merkle proof and the verification result).
+    Requires the submission_digest of the receipt or the admin token, as it contains the answers.
+    """
+    record = await run_in_threadpool(submission_store.get, signature)
+    authorized = record and (is_admin(authorization)
+                             or digest and secret_matches(digest, record["submission_digest"]))
+    if not authorized:
+        raise HTTPException(status_code=404, detail="Receipt not found.")
+    bundle = await run_in_threadpool(verification_bundle, record)
+    return Response(json.dumps(bundle, ensure_ascii=False), media_type="application/json",
+                    headers={"Cache-Control": "private, max-age=3600"})
+
+
+# queues of the open submission streams, None ends a stream
+stream_queues = set()
+streams_ended = False
+
+
+def end_streams():
+    """Ends the open submission streams (and refuses new ones), the server is shutting down."""
+    global streams_ended
+    streams_ended = True
+    for queue in stream_queues:
+        queue.put_nowait(None)
+
+
+def end_streams_on_exit_signals(loop: asyncio.AbstractEventLoop):
+    """
+    Chains the server's SIGINT/SIGTERM handlers to end the open streams when the shutdown begins: uvicorn only runs
+    the lifespan shutdown after all responses finished, so the never-ending streams would hold it for the whole
+    SHUTDOWN_TIMEOUT. Signal handlers can only be set in the main thread, elsewhere (e.g. the test client) the streams
+    end with the lifespan.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(end_streams)
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+async def refresh_submission_streams():
+    """
+    Background task of each worker: while submission streams are open, picks up the submissions stored by other
+    workers once per interval. The index publishes them to the queues of all streams.
+    """
+    while True:
+        await asyncio.sleep(get_settings().submissions_stream_interval)
+        if stream_queues:
+            try:
+                await run_in_threadpool(submissions_index.refresh)
+            except Exception:
+                logging.getLogger(__name__).exception("Refreshing the submissions index failed")
+
+
+@app.get("/submissions/stream")
+async def stream_submissions(request: Request, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Server-Sent Events feed of the submissions table: the full table (or its newest `limit` rows) is sent once as
+    'snapshot' event, afterward only new or overwritten rows are pushed as 'rows' events.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def publish(rows: list):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, rows)
+        except RuntimeError:  # event loop already closed
+            pass
+
+    async def events():
+        # subscribe before taking the snapshot, so no row stored in between is lost
+        submissions_index.subscribe(publish)
+        stream_queues.add(queue)
+        try:
+            if limit:
+                rows, _ = await run_in_threadpool(submissions_index.query, None, limit)
+                payload = json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            else:
+                payload, _ = await run_in_threadpool(submissions_index.snapshot)
+            yield b"event: snapshot\ndata: " + payload + b"\n\n"
+            while not streams_ended and not await request.is_disconnected():
+                try:
+                    rows = await asyncio.wait_for(queue.get(), timeout=get_settings().submissions_stream_interval)
+                    if rows is None:
+                        break
+                    data = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+                    yield f"event: rows\ndata: {data}\n\n".encode("utf-8")
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            stream_queues.discard(queue)
+            submissions_index.unsubscribe(publish)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/admin/reload-questions", dependencies=[Depends(require_admin)])
+async def reload_questions():
+    """Recompile CORRECT_QUESTIONS_PATH in the background and swap it in without blocking requests."""
+    try:
+        catalogue = await run_in_threadpool(questions.reload)
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=500, detail=f"Reloading questions failed: {str(e)}")
+    return {"status": "reloaded", "path": questions.path, "questions": len(catalogue)}
+
+
+@app.post("/admin/reload-settings", dependencies=[Depends(require_admin)])
+async def reload_settings_endpoint():
+    """
+    Read .env again and swap the settings snapshot, requests in flight keep the previous one. Settings read per
+    request (size limits, check options, dedup window, admin token, ...) apply right away, the TSP pool, storage,
+    admission control and caches keep their configuration until restart. Only reloads the worker handling the request.
+    """
+    previous = get_settings()
+    try:
+        current = await run_in_threadpool(reload_settings)
+    except (OSError, ValidationError) as e:
+        raise HTTPException(status_code=500, detail=f"Reloading settings failed: {str(e)}")
+    changed = [field.alias for name, field in type(current).model_fields.items()
+               if getattr(current, name) != getattr(previous, name)]
+    return {"status": "reloaded", "changed": changed}
+
+
+@app.get("/admin/validation-cache", dependencies=[Depends(require_admin)])
+def get_validation_cache_stats():
+    """Hit/miss counters of the validation cache, for sizing VALIDATION_CACHE_SIZE and VALIDATION_CACHE_TTL."""
+    return validation_cache.stats()
+
+
+def get_leaderboard_or_404() -> Leaderboard:
+    if leaderboard is None:
+        raise HTTPException(status_code=404, detail="No gold answers configured (GOLD_ANSWERS_PATH).")
+    return leaderboard
+
+
+@app.get("/admin/leaderboard", dependencies=[Depends(require_admin)])
+async def get_leaderboard():
+    """Ranking of the latest submission per team and submission name, scored against the gold answers."""
+    board = get_leaderboard_or_404()
+    # picks up the submissions stored by other workers
+    await run_in_threadpool(submissions_index.refresh)
+    entries = await run_in_threadpool(board.ranking)
+    return {"questions": len(leaderboard.gold.catalogue), "entries": entries}
+
+
+@app.post("/admin/leaderboard/rescore", dependencies=[Depends(require_admin)])
+async def rescore_leaderboard():
+    """Reload GOLD_ANSWERS_PATH for the current questions and score all submissions again."""
+    board = get_leaderboard_or_404()
+    try:
+        gold = await run_in_threadpool(GoldAnswers.load, get_settings().gold_answers_path, questions.catalogue)
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=500, detail=f"Loading gold answers failed: {str(e)}")
+    entries = await run_in_threadpool(board.rescore, gold)
+    return {"questions": len(gold.catalogue), "entries": entries}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Request, stage latency, TSP error and cache metrics of this worker in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(seconds: float = 10, interval: float = 0.005):
     """
-    Return all submissions as JSON so the frontend can dynamically
-    load them and populate the table.
+    Sample the stacks of this worker for the given number of seconds, returned in collapsed stack format
+    (e.g. for flamegraph.pl or speedscope). Only available if PROFILING_ENABLED is set.
     """
-    submissions_db = []
-    files = os.listdir(os.getenv("SUBMISSIONS_PATH"))
-
-    for file in files:
-        with open(os.path.join(os.getenv("SUBMISSIONS_PATH"), file), "r", encoding="utf-8") as f:
-            submission = json.load(f)
-            submission = {k: v for k, v in submission.items() if k in ["time", "submission_name", "signature"]}
-            submissions_db.append(submission)
-    submissions_db = sorted(submissions_db, key=lambda x: x["time"], reverse=True)
-    return JSONResponse(submissions_db)
+    if not get_settings().profiling_enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled.")
+    seconds = min(max(seconds, 0.1), 60)
+    return await run_in_threadpool(sample_stacks, seconds, max(interval, 0.001))
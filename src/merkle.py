@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+
+# domain separation of leaves and inner nodes (as in RFC 6962), so an inner node can never pass as a leaf
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def hash_leaf(digest: bytes) -> bytes:
+    return hashlib.sha512(LEAF_PREFIX + digest).digest()
+
+
+def hash_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha512(NODE_PREFIX + left + right).digest()
+
+
+def merkle_levels(digests: list[bytes]) -> list[list[bytes]]:
+    """Build all levels of the Merkle tree over the digests, from the leaves up to the root."""
+    levels = [[hash_leaf(digest) for digest in digests]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])  # an odd node is promoted unchanged
+        levels.append(parents)
+    return levels
+
+
+def merkle_proof(levels: list[list[bytes]], index: int) -> list[dict]:
+    """Inclusion proof of the leaf at index: the sibling hashes from the leaf up to the root."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({"position": "left" if sibling < index else "right", "hash": level[sibling].hex()})
+        index //= 2
+    return proof
+
+
+def root_from_proof(digest: bytes, proof: list[dict]) -> bytes:
+    """Recompute the Merkle root from a submission digest and its inclusion proof."""
+    node = hash_leaf(digest)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = hash_node(sibling, node) if step["position"] == "left" else hash_node(node, sibling)
+    return node
+
+
+class MerkleBatcher:
+    """
+    Collects the digests of submissions arriving within `window` seconds (or until `max_size` digests are pending)
+    and timestamps only the root of their Merkle tree. Every submission gets the shared TSP token plus its own
+    inclusion proof.
+    """
+
+    def __init__(self, signing_pool, window: float, max_size: int):
+        self.signing_pool = signing_pool
+        self.window = window
+        self.max_size = max_size
+        self._pending = []
+        self._timer = None
+        self._batches = set()  # tasks signing a batch
+
+    async def sign(self, digest: bytes) -> tuple[bytes, object, dict]:
+        """Returns the TSP token over the batch root, its verification result and the Merkle data of the digest."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((digest, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._sign_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def drain(self):
+        """Sign the pending digests right away and wait until all batches are signed, e.g. on shutdown."""
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    async def _sign_batch(self, batch: list):
+        levels = merkle_levels([digest for digest, _ in batch])
+        root = levels[-1][0]
+        try:
+            signature, verified = await self.signing_pool.sign(root)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for idx, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result((signature, verified, {"merkle_root": root.hex(),
+                                                         "merkle_proof": merkle_proof(levels, idx)}))
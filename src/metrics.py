@@ -0,0 +1,176 @@
+"""
+Low-overhead in-process metrics (counters and histograms) served in Prometheus text format, plus a sampling profiler
+for capturing hot-path stacks of a running worker.
+"""
+import bisect
+import collections
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from starlette.datastructures import Headers
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_000_000, 5_000_000)
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._values = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(self.buckets) + 2)
+            values[idx] += 1
+            values[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(values)) for key, values in self._values.items()]
+        for key, values in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {values[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        self._metrics.append(Counter(name, help))
+        return self._metrics[-1]
+
+    def histogram(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        self._metrics.append(Histogram(name, help, buckets))
+        return self._metrics[-1]
+
+    def register_collector(self, collect: Callable[[], list[str]]):
+        """Register a callable returning additional exposition lines, evaluated on every scrape."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collect in self._collectors:
+            lines += collect()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+stage_duration = registry.histogram("rag_stage_duration_seconds", "Duration of the submission processing stages")
+request_duration = registry.histogram("rag_http_request_duration_seconds", "Duration of HTTP requests per endpoint")
+requests_total = registry.counter("rag_http_requests_total", "HTTP requests per endpoint and status")
+payload_size = registry.histogram("rag_http_request_size_bytes", "Declared request body sizes per endpoint",
+                                  SIZE_BUCKETS)
+tsp_errors = registry.counter("rag_tsp_errors_total", "Failed TSP signings per kind of error")
+admission_rejected = registry.counter("rag_admission_rejected_total", "Submissions rejected by admission control")
+duplicate_submissions = registry.counter("rag_duplicate_submissions_total",
+                                         "Repeated submissions answered with the receipt of the original")
+
+
+@contextmanager
+def stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - start, stage=stage)
+
+
+class MetricsMiddleware:
+    """Counts requests per route and status and records their duration and declared body size."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the route template keeps the label cardinality bounded
+            endpoint = getattr(scope.get("route"), "path", "unmatched")
+            request_duration.observe(time.perf_counter() - start, endpoint=endpoint)
+            requests_total.inc(endpoint=endpoint, method=scope["method"], status=status)
+            content_length = Headers(scope=scope).get("content-length", "")
+            if content_length.isdigit():
+                payload_size.observe(int(content_length), endpoint=endpoint)
+
+
+def sample_stacks(duration: float, interval: float = 0.005) -> str:
+    """
+    Sample the stacks of all threads (except the sampling one) every `interval` seconds for `duration` seconds.
+    Returns them in collapsed stack format ('frame;frame;frame count' per line), as used by flame graph tools.
+    """
+    counts = collections.Counter()
+    own_id = threading.get_ident()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+NON_ALPHANUMERIC = re.compile(r'[^A-Za-z0-9]')
+
+
+def normalize_question(text: str) -> str:
+    return NON_ALPHANUMERIC.sub('', text.lower())
+
+
+class QuestionCatalogue:
+    """
+    The correct questions compiled once into an index: normalized question text -> (index, kind).
+    Used to match submitted answers to questions independent of their order.
+    """
+
+    def __init__(self, questions: list[dict]):
+        self.questions = questions
+        self.index = {}
+        for idx, question in enumerate(questions):
+            self.index.setdefault(normalize_question(question["text"]), (idx, question["kind"]))
+
+    @classmethod
+    def load(cls, path: str) -> "QuestionCatalogue":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __getitem__(self, idx: int) -> dict:
+        return self.questions[idx]
+
+    def match(self, question_texts: list[Optional[str]]) -> tuple[list[Optional[int]], list[int], list[int], list[int]]:
+        """
+        Match answers to question indices by their normalized question text, by position only if the text is absent.
+
+        Returns the matched question index per answer (None if unmatched), the answer indices with unknown questions,
+        the answer indices answering an already answered question and the indices of unanswered questions.
+        """
+        matches, unknown, duplicates = [], [], []
+        answered = set()
+        for pos, text in enumerate(question_texts):
+            if text:
+                idx = self.index.get(normalize_question(text), (None,))[0]
+                if idx is None:
+                    unknown.append(pos)
+            else:
+                idx = pos if pos < len(self.questions) else None
+            if idx is not None and idx in answered:
+                duplicates.append(pos)
+                idx = None
+            if idx is not None:
+                answered.add(idx)
+            matches.append(idx)
+        missing = [idx for idx in range(len(self.questions)) if idx not in answered]
+        return matches, unknown, duplicates, missing
+
+
+class ReloadableQuestions:
+    """
+    Holds the current QuestionCatalogue of a questions file. A new catalogue is compiled completely before it is
+    swapped in, so requests keep validating against the previous one in the meantime and never see a partial state.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = os.stat(path).st_mtime_ns
+        self.catalogue = QuestionCatalogue.load(path)
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def reload(self, path: Optional[str] = None) -> QuestionCatalogue:
+        """Recompile the questions file (or switch to another one) and swap it in."""
+        with self._lock:
+            path = path or self.path
+            mtime = os.stat(path).st_mtime_ns
+            catalogue = QuestionCatalogue.load(path)
+            self.path, self._mtime, self.catalogue = path, mtime, catalogue
+            return catalogue
+
+    def reload_if_changed(self) -> bool:
+        try:
+            if os.stat(self.path).st_mtime_ns == self._mtime:
+                return False
+            self.reload()
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            # keep serving the previous catalogue, e.g. while the file is being rewritten
+            logger.warning(f"Reloading questions from {self.path} failed: {e}")
+            return False
+
+    def watch(self, interval: float):
+        """Check the questions file for changes every `interval` seconds in a background thread."""
+        if self._watcher:
+            return
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=run, name="questions-watcher", daemon=True)
+        self._watcher.start()
@@ -0,0 +1,246 @@
+"""
+Scoring of submissions against gold answers and the leaderboard built from it.
+
+The gold answers file is a JSON list aligned with the questions (by question_text, by position if it is absent):
+
+    [{"question_text": "...", "kind": "number", "value": [123.4, "N/A"], "references": [{"pdf_sha1": "...", "page_index": 3}]}]
+
+A list of values lists alternative correct answers, for kind "names" it is the set of expected names. Submissions are
+encoded into columnar arrays (submissions x questions) and scored for all of them at once with NumPy.
+"""
+import collections
+import json
+import threading
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.questions import QuestionCatalogue, normalize_question
+
+NA_VALUES = ("n/a", "na", "nan", "")
+NUMBER_TOLERANCE = 0.01  # relative
+# reference pages count less than the answer itself: a question scores up to 1 + REFERENCE_WEIGHT points
+REFERENCE_WEIGHT = 0.25
+PADDING = -2  # never matches a token id
+
+
+def _is_na(value) -> bool:
+    return value is None or isinstance(value, str) and value.strip().lower() in NA_VALUES
+
+
+def _normalize(value) -> str:
+    return " ".join(str(value).lower().split())
+
+
+def _token(kind: str, value) -> Optional[str]:
+    """Comparable token of a non-numeric answer, None if it cannot be correct for the kind."""
+    if _is_na(value):
+        return "n/a"
+    if kind == "boolean":
+        if isinstance(value, bool):
+            return str(value).lower()
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower()
+        return None
+    if kind == "name" and isinstance(value, str):
+        return _normalize(value)
+    return None
+
+
+def _reference_key(reference: dict) -> str:
+    return f"{reference.get('pdf_sha1')}:{reference.get('page_index')}"
+
+
+class _Vocabulary(dict):
+    """Ids of strings, ids of the gold answers are fixed, strings only seen in submissions get ids per batch."""
+
+    def id(self, key: str) -> int:
+        return self.setdefault(key, len(self))
+
+
+def _pairs(pairs: list[tuple[int, int]]) -> tuple[np.ndarray, np.ndarray]:
+    array = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return array[:, 0], array[:, 1]
+
+
+def _overlap(items: list[tuple[int, int, int]], gold_q: np.ndarray, gold_ids: np.ndarray, shape: tuple,
+             vocabulary_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per (submission, question): number of distinct submitted items and how many of them are gold items.
+    Items are (submission, question, id) triples, gold items (question, id) pairs.
+    """
+    count, hits = np.zeros(shape), np.zeros(shape)
+    if not items:
+        return count, hits
+    s_idx, q_idx, ids = np.array(items, dtype=np.int64).T
+    _, first = np.unique((s_idx * shape[1] + q_idx) * vocabulary_size + ids, return_index=True)
+    s_idx, q_idx, ids = s_idx[first], q_idx[first], ids[first]
+    hit = np.isin(q_idx * vocabulary_size + ids, gold_q * vocabulary_size + gold_ids)
+    np.add.at(count, (s_idx, q_idx), 1)
+    np.add.at(hits, (s_idx, q_idx), hit)
+    return count, hits
+
+
+class GoldAnswers:
+    """The gold answers of all questions of a catalogue, compiled into padded arrays."""
+
+    def __init__(self, answers: list[dict], catalogue: QuestionCatalogue, tolerance: float = NUMBER_TOLERANCE):
+        self.catalogue = catalogue
+        self.tolerance = tolerance
+        n = len(catalogue)
+        self.kinds = np.array([question["kind"] for question in catalogue.questions])
+        self.vocabulary = _Vocabulary()
+        tokens, numbers = [[] for _ in range(n)], [[] for _ in range(n)]
+        names, references = [], []  # (question, id) pairs
+
+        for pos, item in enumerate(answers):
+            text = item.get("question_text")
+            q = catalogue.index.get(normalize_question(text), (None,))[0] if text else pos
+            if q is None or q >= n:
+                raise ValueError(f"Gold answer {pos} does not match any question: {text!r}")
+            kind = self.kinds[q]
+            values = item["value"] if isinstance(item["value"], list) and kind != "names" else [item["value"]]
+            for value in values:
+                if kind == "names" and not _is_na(value):
+                    value = value if isinstance(value, list) else [value]
+                    names += [(q, self.vocabulary.id(_normalize(name))) for name in value]
+                elif kind == "number" and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numbers[q].append(float(value))
+                elif (token := _token(kind, value)) is not None:
+                    tokens[q].append(self.vocabulary.id(token))
+            references += [(q, self.vocabulary.id(_reference_key(ref))) for ref in item.get("references", [])]
+
+        width = max([len(t) for t in tokens] + [1])
+        self.tokens = np.full((n, width), PADDING)
+        for q, ids in enumerate(tokens):
+            self.tokens[q, :len(ids)] = ids
+        width = max([len(v) for v in numbers] + [1])
+        self.numbers = np.full((n, width), np.nan)
+        for q, values in enumerate(numbers):
+            self.numbers[q, :len(values)] = values
+        self.names_q, self.names_ids = _pairs(names)
+        self.names_count = np.bincount(self.names_q, minlength=n)
+        self.references_q, self.references_ids = _pairs(references)
+        self.references_count = np.bincount(self.references_q, minlength=n)
+
+    @classmethod
+    def load(cls, path: str, catalogue: QuestionCatalogue) -> "GoldAnswers":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), catalogue)
+
+    def score(self, records: list[dict]) -> list[dict]:
+        """Score the answers of many submission records at once."""
+        n_submissions, n_questions = len(records), len(self.catalogue)
+        shape = (n_submissions, n_questions)
+        vocabulary = _Vocabulary(self.vocabulary)
+        numbers = np.full(shape, np.nan)
+        tokens = np.full(shape, -1)
+        answered = np.zeros(n_submissions, dtype=int)
+        names, references = [], []  # (submission, question, id) triples
+
+        for s, record in enumerate(records):
+            answers = record.get("answers", [])
+            matches, _, _, _ = self.catalogue.match([answer.get("question_text") for answer in answers])
+            for q, answer in zip(matches, answers):
+                if q is None:
+                    continue
+                answered[s] += 1
+                kind, value = self.kinds[q], answer.get("value")
+                if kind == "number" and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numbers[s, q] = value
+                elif kind == "names" and not _is_na(value):
+                    value = value if isinstance(value, list) else [value]
+                    names += [(s, q, vocabulary.id(_normalize(name))) for name in value]
+                elif (token := _token(kind, value)) is not None:
+                    tokens[s, q] = self.vocabulary.get(token, -1)
+                references += [(s, q, vocabulary.id(_reference_key(ref))) for ref in answer.get("references", [])]
+
+        exact = (tokens[:, :, None] == self.tokens[None]).any(axis=2)
+        with np.errstate(invalid="ignore"):
+            close = (np.abs(numbers[:, :, None] - self.numbers[None])
+                     <= self.tolerance * np.abs(self.numbers[None])).any(axis=2)
+        scores = (exact | close).astype(float)
+
+        # names: Jaccard overlap with the expected set, N/A questions were matched as token above
+        count, hits = _overlap(names, self.names_q, self.names_ids, shape, len(vocabulary))
+        union = count + self.names_count[None] - hits
+        overlap = np.divide(hits, union, out=np.zeros(shape), where=union > 0)
+        names_columns = (self.kinds == "names") & (self.names_count > 0)
+        scores[:, names_columns] = overlap[:, names_columns]
+
+        # references: F1 of the submitted pages, only for questions with gold pages
+        count, hits = _overlap(references, self.references_q, self.references_ids, shape, len(vocabulary))
+        total = count + self.references_count[None]
+        f1 = np.divide(2 * hits, total, out=np.zeros(shape), where=total > 0)
+        reference_points = f1[:, self.references_count > 0].sum(axis=1)
+
+        value_scores = scores.sum(axis=1)
+        return [{"score": round(float(value_scores[s] + REFERENCE_WEIGHT * reference_points[s]), 4),
+                 "value_score": round(float(value_scores[s]), 4),
+                 "reference_score": round(float(reference_points[s]), 4),
+                 "answered": int(answered[s])} for s in range(n_submissions)]
+
+
+class Leaderboard:
+    """
+    Ranking of the latest submission per team_email and submission_name.
+
+    The first request scores all stored records at once, afterward only new submissions are scored: the leaderboard
+    subscribes to the submissions index and scores the records of the notified rows on the next request.
+    """
+
+    def __init__(self, store, gold: GoldAnswers):
+        self.store = store
+        self.gold = gold
+        self._entries = None  # (team_email, submission_name) -> entry
+        self._pending = collections.deque()  # signatures, appended without locking
+        self._ranking = []
+        self._lock = threading.Lock()
+
+    def notify(self, rows: list[dict]):
+        """Subscriber of the submissions index, must not block."""
+        self._pending.extend(row["signature"] for row in rows)
+
+    @staticmethod
+    def _replaces(entry: dict, record: dict) -> bool:
+        # records are merged in store order, within the same second the later stored record is the current one
+        return entry["time"] < record["time"] or (entry["time"] == record["time"]
+                                                  and entry["signature"] != record["signature"])
+
+    def _merge(self, records: Iterable[dict]) -> bool:
+        """Score the records (in store order) that replace the entries of their team_email and submission_name."""
+        latest = {}
+        for record in records:
+            key = (record["team_email"], record["submission_name"])
+            if key not in latest or latest[key]["time"] <= record["time"]:
+                latest[key] = record
+        fresh = [record for key, record in latest.items()
+                 if key not in self._entries or self._replaces(self._entries[key], record)]
+        if not fresh:
+            return False
+        for record, score in zip(fresh, self.gold.score(fresh)):
+            self._entries[(record["team_email"], record["submission_name"])] = {
+                "team_email": record["team_email"], "submission_name": record["submission_name"],
+                "time": record["time"], "signature": record["signature"], **score}
+        return True
+
+    def ranking(self) -> list[dict]:
+        """Entries sorted by score, earlier submissions first on ties."""
+        with self._lock:
+            pending = [self._pending.popleft() for _ in range(len(self._pending))]
+            if self._entries is None:
+                self._entries = {}
+                changed = self._merge(self.store.iter_records())
+            else:
+                changed = self._merge(record for signature in pending
+                                      if (record := self.store.get(signature)) is not None)
+            if changed:
+                self._ranking = sorted(self._entries.values(), key=lambda e: (-e["score"], e["time"]))
+            return self._ranking
+
+    def rescore(self, gold: GoldAnswers) -> list[dict]:
+        """Switch to other gold answers (e.g. after the questions changed) and score everything again."""
+        with self._lock:
+            self.gold = gold
+            self._entries = None
+        return self.ranking()
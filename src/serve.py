@@ -0,0 +1,58 @@
+"""
+Production entry point: several uvicorn worker processes, without auto-reload.
+
+    python -m src.serve --host 0.0.0.0 --port 8000 --workers 4
+
+Before the workers start, the questions file is compiled once to fail fast on errors and the submission store is
+created, so the workers do not race on the SQLite schema. Each worker keeps its own submissions index and caches,
+they poll the shared store on every read, so a submission handled by one worker is listed by all of them.
+On SIGTERM/SIGINT the workers stop accepting connections, end the open submission streams, finish running requests
+and drain pending TSP signings (at most SHUTDOWN_TIMEOUT seconds).
+"""
+import argparse
+import logging
+import os
+
+import uvicorn
+
+from src.questions import QuestionCatalogue
+from src.settings import load_settings
+from src.storage import open_store
+
+logger = logging.getLogger(__name__)
+
+
+def prepare(settings) -> int:
+    """Check the configuration shared by all workers, returns the number of questions."""
+    catalogue = QuestionCatalogue.load(settings.correct_questions_path)
+    open_store(settings.storage_backend, settings.submissions_path)
+    return len(catalogue)
+
+
+def main():
+    # not load_dotenv(): the workers inherit os.environ, .env values in it would take precedence over reloaded ones
+    settings = load_settings()
+    parser = argparse.ArgumentParser(description="Run the submission API with several worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.workers or os.cpu_count() or 1,
+                        help="worker processes (default: WORKERS or the number of CPU cores)")
+    parser.add_argument("--shutdown-timeout", type=float, default=settings.shutdown_timeout,
+                        help="seconds running requests get to finish on shutdown (default: SHUTDOWN_TIMEOUT)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    questions = prepare(settings)
+    logger.info(f"Serving {questions} questions from {settings.correct_questions_path} with {args.workers} workers")
+    if args.workers > 1 and settings.questions_reload_interval <= 0:
+        logger.warning("/admin/reload-questions only reloads the worker handling the request, "
+                       "set QUESTIONS_RELOAD_INTERVAL to reload the questions in all workers")
+
+    uvicorn.run("src.main:app", host=args.host, port=args.port, workers=args.workers,
+                timeout_graceful_shutdown=args.shutdown_timeout, log_level=args.log_level,
+                proxy_headers=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+from typing import Literal, Mapping, Optional
+
+from dotenv import dotenv_values
+from pydantic import BaseModel, ConfigDict, Field
+
+# the process environment before load_dotenv() added the .env values, it takes precedence over .env on reloads
+_process_environ = dict(os.environ)
+
+
+class Settings(BaseModel):
+    """
+    Typed snapshot of the runtime configuration, parsed once from the environment (see .env).
+    Handlers read the current snapshot via get_settings(), replacing it is a single atomic reference swap.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    correct_questions_path: str = Field(..., alias="CORRECT_QUESTIONS_PATH")
+    questions_reload_interval: float = Field(0, alias="QUESTIONS_RELOAD_INTERVAL")
+    submissions_path: str = Field(..., alias="SUBMISSIONS_PATH")
+    storage_backend: Literal["sqlite", "json"] = Field("sqlite", alias="STORAGE_BACKEND")
+    submissions_stream_interval: float = Field(2, alias="SUBMISSIONS_STREAM_INTERVAL")
+    development: bool = Field(False, alias="DEVELOPMENT")
+    max_json_size: int = Field(2000000, alias="MAX_JSON_SIZE")
+    check_questions: bool = Field(False, alias="CHECK_QUESTIONS")
+    check_batch_size: int = Field(50, alias="CHECK_BATCH_SIZE")
+    tsp_url: Optional[str] = Field(None, alias="TSP_URL")
+    tsp_ca_file: Optional[str] = Field(None, alias="TSP_CA_FILE")
+    tsp_max_concurrency: int = Field(8, alias="TSP_MAX_CONCURRENCY")
+    tsp_timeout: float = Field(10, alias="TSP_TIMEOUT")
+    tsp_batch_window: float = Field(0, alias="TSP_BATCH_WINDOW")
+    tsp_batch_size: int = Field(64, alias="TSP_BATCH_SIZE")
+    submit_max_in_flight: int = Field(16, alias="SUBMIT_MAX_IN_FLIGHT")
+    submit_queue_size: int = Field(64, alias="SUBMIT_QUEUE_SIZE")
+    submit_queue_timeout: float = Field(15, alias="SUBMIT_QUEUE_TIMEOUT")
+    submit_team_rate: float = Field(0, alias="SUBMIT_TEAM_RATE")
+    submit_team_burst: int = Field(5, alias="SUBMIT_TEAM_BURST")
+    submit_dedup_window: float = Field(600, alias="SUBMIT_DEDUP_WINDOW")
+    validation_cache_size: int = Field(256, alias="VALIDATION_CACHE_SIZE")
+    validation_cache_ttl: float = Field(600, alias="VALIDATION_CACHE_TTL")
+    gold_answers_path: Optional[str] = Field(None, alias="GOLD_ANSWERS_PATH")
+    admin_token: Optional[str] = Field(None, alias="ADMIN_TOKEN")
+    profiling_enabled: bool = Field(False, alias="PROFILING_ENABLED")
+    workers: int = Field(0, alias="WORKERS")
+    shutdown_timeout: float = Field(30, alias="SHUTDOWN_TIMEOUT")
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "Settings":
+        """Unset and empty variables fall back to the defaults."""
+        environ = os.environ if environ is None else environ
+        names = [field.alias for field in cls.model_fields.values()]
+        return cls(**{name: environ[name] for name in names if environ.get(name)})
+
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    global _settings
+    if _settings is None:
+        _settings = Settings.from_env()
+    return _settings
+
+
+def replace_settings(settings: Settings) -> Settings:
+    """Atomically swap the settings snapshot, requests in flight keep the snapshot they started with."""
+    global _settings
+    _settings = settings
+    return settings
+
+
+def load_settings(dotenv_path: Optional[str] = None) -> Settings:
+    """
+    Settings of the .env file, values of the process environment take precedence. Unlike load_dotenv() this leaves
+    os.environ untouched, so processes started from here (the workers) do not pin the current .env values.
+    """
+    values = dotenv_values(dotenv_path) if dotenv_path else dotenv_values()
+    return Settings.from_env({**values, **_process_environ})
+
+
+def reload_settings(dotenv_path: Optional[str] = None) -> Settings:
+    """Read the .env file again (values of the process environment take precedence) and swap the snapshot."""
+    return replace_settings(load_settings(dotenv_path))
@@ -0,0 +1,96 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from tsp_client import TSPSigner, TSPVerifier, SigningSettings, VerifyResult
+
+from src.metrics import stage_timer
+
+
+class TSPTimeoutError(Exception):
+    """The TSP server did not answer within the configured timeout."""
+
+
+class _RecordingVerifier:
+    """
+    Verifier for TSPSigner that keeps the result of the verification it runs inside sign() (per thread), as sign()
+    only returns the token.
+    """
+
+    def __init__(self, verifier: TSPVerifier):
+        self.verifier = verifier
+        self._local = threading.local()
+
+    def verify(self, *args, **kwargs) -> VerifyResult:
+        with stage_timer("tsp_verify"):
+            self._local.result = self.verifier.verify(*args, **kwargs)
+        return self._local.result
+
+    def pop_result(self) -> VerifyResult:
+        result, self._local.result = self._local.result, None
+        return result
+
+
+class TSPSigningPool:
+    """
+    Signs message digests with a TSP server in a bounded pool of worker threads.
+
+    Signer and verifier instances are shared by all workers and the HTTP connections to the TSP server are kept
+    alive in a session, so a signing only costs the actual RFC 3161 round trip. Every call is bounded by `timeout`,
+    the number of concurrent round trips by `max_concurrency`.
+    """
+
+    def __init__(self, tsp_url: Optional[str] = None, max_concurrency: int = 8, timeout: float = 10.0,
+                 ca_pem_file: Optional[str] = None):
+        self.tsp_url = tsp_url
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="tsp-signing")
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        transport = functools.partial(self._session.post, timeout=timeout)
+        if tsp_url:
+            self._settings = SigningSettings(tsp_server=tsp_url, transport=transport)
+        else:
+            self._settings = SigningSettings(transport=transport)
+        # trust roots for the TSA certificate, defaults to the certifi CA bundle
+        self._verifier = TSPVerifier(ca_pem_file=ca_pem_file)
+        self._recording_verifier = _RecordingVerifier(self._verifier)
+        self._signer = TSPSigner()
+        # TSPSigner (tsp-client 0.2.1) verifies every token (nonce, digest, clock drift) with its private _verifier,
+        # a TSPVerifier with the default trust roots that cannot be passed in. Replacing it applies our trust roots
+        # and lets sign_blocking() reuse the result instead of verifying the token a second time.
+        self._signer._verifier = self._recording_verifier
+
+    def sign_blocking(self, digest: bytes) -> tuple[bytes, VerifyResult]:
+        """Request a timestamp token for the digest and verify it. Blocks the calling thread."""
+        with stage_timer("tsp_request"):  # includes the verification (stage tsp_verify)
+            signature = self._signer.sign(message_digest=digest, signing_settings=self._settings)
+        return signature, self._recording_verifier.pop_result()
+
+    def verify(self, token: bytes, digest: bytes) -> VerifyResult:
+        """Verify a stored timestamp token against the digest and the trust roots, raises on invalid tokens."""
+        with stage_timer("tsp_verify"):
+            return self._verifier.verify(token, message_digest=digest)
+
+    async def sign(self, digest: bytes) -> tuple[bytes, VerifyResult]:
+        """Sign the digest in the pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self.sign_blocking, digest)
+        try:
+            # the HTTP timeout applies to connecting and to each read separately, so a slow round trip can take up to
+            # about twice the timeout before requests gives up; this bound covers that plus the wait for a free worker
+            return await asyncio.wait_for(future, timeout=self.timeout * 2)
+        except (asyncio.TimeoutError, requests.Timeout) as e:
+            raise TSPTimeoutError(f"No response from TSP server within {self.timeout} seconds") from e
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting new signings, optionally waiting for in-flight ones to finish."""
+        self._executor.shutdown(wait=wait)
+        self._session.close()
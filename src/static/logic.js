@@ -29,31 +29,108 @@
     }
   }
 
+  // The submit response is a compact receipt, the verification data is fetched when it is copied
+  async function copyVerificationData() {
+    const tspData = document.getElementById("tsp-verification-data");
+    if (!tspData.textContent) {
+      const resp = await fetch(tspData.dataset.receiptUrl);
+      if (!resp.ok) {
+        alert("Error: " + resp.status + " Could not load the verification data.");
+        return;
+      }
+      const bundle = await resp.json();
+      tspData.textContent = JSON.stringify(bundle.tsp_verification_data);
+    }
+    await copyCode("tsp-verification-data");
+  }
+
   // Load submissions
-  async function loadSubmissions() {
-    const resp = await fetch("/submissions");
-    const data = await resp.json();
+  function createSubmissionRow(entry) {
+    const row = document.createElement("tr");
+    row.dataset.signature = entry.signature;
+    row.dataset.time = entry.time;
+
+    const timeCell = document.createElement("td");
+    timeCell.textContent = entry.time;
+    row.appendChild(timeCell);
+
+    const idCell = document.createElement("td");
+    idCell.textContent = entry.submission_name;
+    row.appendChild(idCell);
+
+    const sigCell = document.createElement("td");
+    sigCell.textContent = entry.signature;
+    row.appendChild(sigCell);
+
+    return row;
+  }
 
+  function renderSubmissions(data) {
     const tbody = document.querySelector("#submissionsTable tbody");
     tbody.innerHTML = "";
+    data.forEach(entry => tbody.appendChild(createSubmissionRow(entry)));
+  }
+
+  // Insert a new row at its time position, dropping the row of the submission it overwrites
+  function upsertSubmission(entry) {
+    const tbody = document.querySelector("#submissionsTable tbody");
+    const row = createSubmissionRow(entry);
+    Array.from(tbody.rows)
+        .filter(r => r.dataset.signature === entry.signature || r.dataset.signature === entry.replaces)
+        .forEach(r => r.remove());
+    const next = Array.from(tbody.rows).find(r => r.dataset.time < entry.time);
+    tbody.insertBefore(row, next || null);
+  }
 
+  // The table shows the newest page, older pages are appended on demand and later changes are applied as deltas
+  const PAGE_SIZE = 100;
+  let latestTime = null;
+  let nextPageCursor = null;
+
+  function trackPage(data) {
     data.forEach(entry => {
-      const row = document.createElement("tr");
+      if (!latestTime || entry.time > latestTime) latestTime = entry.time;
+    });
+  }
+
+  function setNextPage(data) {
+    const last = data[data.length - 1];
+    nextPageCursor = data.length === PAGE_SIZE ? `${last.time},${last.signature}` : null;
+    document.querySelector("#loadMoreSubmissions").style.display = nextPageCursor ? "" : "none";
+  }
 
-      const timeCell = document.createElement("td");
-      timeCell.textContent = entry.time;
-      row.appendChild(timeCell);
+  function showFirstPage(data) {
+    renderSubmissions(data);
+    latestTime = null;
+    trackPage(data);
+    setNextPage(data);
+  }
 
-      const idCell = document.createElement("td");
-      idCell.textContent = entry.submission_name;
-      row.appendChild(idCell);
+  async function loadSubmissions() {
+    const resp = await fetch(`/submissions?limit=${PAGE_SIZE}`);
+    showFirstPage(await resp.json());
+  }
 
-      const sigCell = document.createElement("td");
-      sigCell.textContent = entry.signature;
-      row.appendChild(sigCell);
+  async function loadMoreSubmissions() {
+    if (!nextPageCursor) return;
+    const params = new URLSearchParams({limit: PAGE_SIZE, after: nextPageCursor});
+    const resp = await fetch(`/submissions?${params}`);
+    const data = await resp.json();
+    const tbody = document.querySelector("#submissionsTable tbody");
+    data.forEach(entry => tbody.appendChild(createSubmissionRow(entry)));
+    setNextPage(data);
+  }
 
-      tbody.appendChild(row);
-    });
+  // Only fetch the rows added or overwritten since the newest row shown
+  async function loadSubmissionDeltas() {
+    if (!latestTime) {
+      await loadSubmissions();
+      return;
+    }
+    const resp = await fetch(`/submissions?${new URLSearchParams({since: latestTime})}`);
+    const data = await resp.json();
+    data.forEach(upsertSubmission);
+    trackPage(data);
   }
 
   let toggle_loop_load = false;
@@ -65,7 +142,7 @@
       const successBanner = document.querySelector("#loopLoadSubmissions");
       successBanner.style.backgroundColor = "rgba(12, 49, 74, 1)";
     } else {
-      interval = setInterval(loadSubmissions, 2000);
+      interval = setInterval(loadSubmissionDeltas, 2000);
       toggle_loop_load = true;
       // change button id=loopLoadSubmissions color
       const successBanner = document.querySelector("#loopLoadSubmissions");
@@ -73,6 +150,33 @@
     }
   }
 
+  // Without the stream: show the first page right away, then poll for changes
+  function pollSubmissions() {
+    loadSubmissions();
+    loopLoadSubmissions();
+  }
+
+  // Live submissions feed, its snapshot event shows the first page; falls back to polling if the stream is unavailable
+  function streamSubmissions() {
+    if (!window.EventSource) {
+      pollSubmissions();
+      return;
+    }
+    const stream = new EventSource(`/submissions/stream?limit=${PAGE_SIZE}`);
+    stream.addEventListener("snapshot", event => showFirstPage(JSON.parse(event.data)));
+    stream.addEventListener("rows", event => {
+      const data = JSON.parse(event.data);
+      data.forEach(upsertSubmission);
+      trackPage(data);
+    });
+    stream.onerror = () => {
+      // the browser reconnects by itself unless the stream was refused
+      if (stream.readyState === EventSource.CLOSED && !toggle_loop_load) {
+        pollSubmissions();
+      }
+    };
+  }
+
   // Hide success banner
   function hideBanner() {
     const successBanner = document.querySelector(".success-banner");
@@ -128,10 +232,11 @@
           return;
         }
       }
+      // the check token lets the server reuse the validation of the identical content
       const response = await fetch("/submit-ui", {
         method: "POST",
         headers: {"Content-Type": "application/x-www-form-urlencoded"},
-        body: new URLSearchParams({content}),
+        body: new URLSearchParams({content, check_token: result_validation.check_token}),
       });
       const result = await response.json();
 
@@ -153,7 +258,8 @@
       const bannerSubmitData = document.querySelector("#submission-data")
       bannerSubmitData.innerHTML = "Team: " + result.response.submission_name + "<br>Signature: " + result.response.signature;
       const bannerSubmitTspData = document.querySelector("#tsp-verification-data")
-      bannerSubmitTspData.textContent = JSON.stringify(result.response.tsp_verification_data);
+      bannerSubmitTspData.textContent = "";
+      bannerSubmitTspData.dataset.receiptUrl = result.response.receipt_url;
 
       // scroll to top to show submission success banner
       window.scrollTo(0, 0);
@@ -161,6 +267,4 @@
     await loadSubmissions();
   });
 
-  window.addEventListener("DOMContentLoaded", () => {
-    loadSubmissions();
-  });
\ No newline at end of file
+  window.addEventListener("DOMContentLoaded", streamSubmissions);
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Static files served from memory with precompressed variants and cache validators.
+
+All files are read at startup: text assets (JS, CSS, JSON, SVG, ...) are compressed once with every supported encoding
+and served according to Accept-Encoding, each file gets a strong ETag from the hash of its content. URLs created with
+`url()` carry the content hash (`?v=...`) and are cached by browsers for a year, other requests have to revalidate and
+are answered with 304 while the file is unchanged. Files are checked for changes on request (a stat call), so e.g. a
+reloaded questions.json is picked up without restart.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import get_route_path
+
+from src.compression import brotli, etag_matches, negotiate_encoding
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml", "image/x-icon")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@dataclass
+class StaticFile:
+    content_type: str
+    version: str  # hash of the content
+    mtime_ns: int
+    size: int
+    variants: dict = field(default_factory=dict)  # encoding (None for identity) -> bytes
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+
+def _load(path: str) -> StaticFile:
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        data = f.read()
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    static_file = StaticFile(content_type, hashlib.sha256(data).hexdigest()[:16], stat.st_mtime_ns, stat.st_size,
+                             {None: data})
+    if content_type.startswith(COMPRESSIBLE_TYPES):
+        # best compression, it only runs once per file
+        candidates = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli:
+            candidates["br"] = brotli.compress(data, quality=11)
+        static_file.variants.update({encoding: body for encoding, body in candidates.items() if len(body) < len(data)})
+    return static_file
+
+
+class PrecompressedStaticFiles:
+    """ASGI app serving the files of a directory, a drop-in for starlette's StaticFiles without range requests."""
+
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+        self.files: dict[str, StaticFile] = {}
+        self.generation = 0  # incremented whenever a file changed, e.g. to invalidate pages with its URL
+        self._lock = threading.Lock()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                self.files[os.path.relpath(path, self.directory).replace(os.sep, "/")] = _load(path)
+
+    def get(self, path: str) -> Optional[StaticFile]:
+        """The current version of a file (reloaded if it changed on disk), None if it does not exist."""
+        path = posixpath.normpath(path).lstrip("/")
+        full_path = os.path.realpath(os.path.join(self.directory, path))
+        if os.path.commonpath([full_path, self.directory]) != self.directory:
+            return None
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            if self.files.pop(path, None):
+                self.generation += 1
+            return None
+        static_file = self.files.get(path)
+        if static_file is None or (static_file.mtime_ns, static_file.size) != (stat.st_mtime_ns, stat.st_size):
+            if not os.path.isfile(full_path):
+                return None
+            with self._lock:
+                static_file = self.files[path] = _load(full_path)
+                self.generation += 1
+        return static_file
+
+    def url(self, path: str, prefix: str = "static/") -> str:
+        """Content-hashed URL of a file, for templates."""
+        static_file = self.get(path)
+        return f"{prefix}{path}?v={static_file.version}" if static_file else f"{prefix}{path}"
+
+    def response(self, path: str, version: Optional[str], accept_encoding: Optional[str],
+                 if_none_match: Optional[str], head: bool = False) -> Response:
+        static_file = self.get(path)
+        if static_file is None:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding not in static_file.variants:
+            encoding = None
+        headers = {"ETag": f'"{static_file.version}-{encoding}"' if encoding else static_file.etag,
+                   "Cache-Control": IMMUTABLE if version == static_file.version else "no-cache"}
+        if len(static_file.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        body = static_file.variants[encoding]
+        if head:
+            headers["Content-Length"] = str(len(body))
+            body = b""
+        return Response(body, media_type=static_file.content_type, headers=headers)
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            request_headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+            version = parse_qs(scope["query_string"].decode("latin-1")).get("v", [None])[-1]
+            response = self.response(get_route_path(scope), version, request_headers.get("accept-encoding"),
+                                     request_headers.get("if-none-match"), head=scope["method"] == "HEAD")
+        await response(scope, receive, send)
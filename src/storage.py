@@ -0,0 +1,285 @@
+"""
+Pluggable storage backends for submission records.
+
+Records are append-only: a new submission with the same team_email and submission_name overwrites the previous one
+in the submissions table, but all records are kept for TSP verification. The default backend is an embedded SQLite
+database, the JSON directory backend keeps the original one-file-per-submission layout. Existing JSON directories
+can be imported into the database with:
+
+    python -m src.storage import <json directory> <database file>
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional
+
+import orjson
+
+from src.canonical import splice_record
+
+SQLITE_FILE_NAME = "submissions.sqlite3"
+
+
+def table_row(record: dict) -> dict:
+    return {k: record.get(k) for k in ("time", "submission_name", "signature", "team_email")}
+
+
+class SubmissionStore(ABC):
+    """Interface of the storage backends."""
+
+    @abstractmethod
+    def add(self, metadata: dict, payload: bytes, team_email: str, submission_name: str) -> dict:
+        """
+        Append the record of metadata and canonical payload atomically, returns its table row. Rows carry the
+        position of the record in the store ("seq"), which orders records stored within the same second.
+        """
+
+    @abstractmethod
+    def get(self, signature: str) -> Optional[dict]:
+        """The full record with the given signature."""
+
+    @abstractmethod
+    def latest(self, team_email: str, submission_name: str) -> Optional[dict]:
+        """The most recent full record of a team's submission name."""
+
+    @abstractmethod
+    def find(self, submission_digest: str, team_email: str, submission_name: str) -> Optional[dict]:
+        """The most recent full record of a team's submission name with the given digest."""
+
+    @abstractmethod
+    def poll(self) -> list[dict]:
+        """Table rows of the records appended since the last poll (by any process), all rows on the first call."""
+
+    @abstractmethod
+    def iter_records(self) -> Iterator[dict]:
+        """All full records in insertion order."""
+
+
+class SQLiteStore(SubmissionStore):
+    """
+    Append-only record log in SQLite with indexes on (team_email, submission_name), signature, time and digest.
+    WAL mode lets several uvicorn workers read while one writes, each thread uses its own connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._cursor = 0
+        self._poll_lock = threading.Lock()  # polls run in threadpool workers, each row is returned once
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS submissions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    time TEXT NOT NULL,
+                    team_email TEXT NOT NULL,
+                    submission_name TEXT NOT NULL,
+                    signature TEXT NOT NULL UNIQUE,
+                    submission_digest TEXT NOT NULL,
+                    record BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS submissions_team_name ON submissions (team_email, submission_name, id);
+                CREATE INDEX IF NOT EXISTS submissions_time ON submissions (time);
+                CREATE INDEX IF NOT EXISTS submissions_digest ON submissions (submission_digest);
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def insert(self, record: bytes, row: dict, digest: str) -> Optional[int]:
+        """Append a serialized record, returns its row id (None if a record with the signature is already stored)."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO submissions (time, team_email, submission_name, signature, submission_digest, "
+                "record) VALUES (?, ?, ?, ?, ?, ?)",
+                (row["time"], row["team_email"], row["submission_name"], row["signature"], digest, record))
+            return cursor.lastrowid if cursor.rowcount > 0 else None
+
+    def add(self, metadata: dict, payload: bytes, team_email: str, submission_name: str) -> dict:
+        row = table_row({**metadata, "team_email": team_email, "submission_name": submission_name})
+        row["seq"] = self.insert(splice_record(metadata, payload), row, metadata["submission_digest"])
+        return row
+
+    def _one(self, query: str, params: tuple) -> Optional[dict]:
+        result = self._connection().execute(query, params).fetchone()
+        return orjson.loads(result[0]) if result else None
+
+    def get(self, signature: str) -> Optional[dict]:
+        return self._one("SELECT record FROM submissions WHERE signature = ?", (signature,))
+
+    def latest(self, team_email: str, submission_name: str) -> Optional[dict]:
+        return self._one("SELECT record FROM submissions WHERE team_email = ? AND submission_name = ? "
+                         "ORDER BY id DESC LIMIT 1", (team_email, submission_name))
+
+    def find(self, submission_digest: str, team_email: str, submission_name: str) -> Optional[dict]:
+        return self._one("SELECT record FROM submissions WHERE submission_digest = ? AND team_email = ? "
+                         "AND submission_name = ? ORDER BY id DESC LIMIT 1",
+                         (submission_digest, team_email, submission_name))
+
+    def poll(self) -> list[dict]:
+        with self._poll_lock:
+            rows = self._connection().execute(
+                "SELECT id, time, submission_name, signature, team_email FROM submissions WHERE id > ? ORDER BY id",
+                (self._cursor,)).fetchall()
+            if rows:
+                self._cursor = rows[-1][0]
+        return [{"time": r[1], "submission_name": r[2], "signature": r[3], "team_email": r[4], "seq": r[0]}
+                for r in rows]
+
+    def iter_records(self) -> Iterator[dict]:
+        for (record,) in self._connection().execute("SELECT record FROM submissions ORDER BY id"):
+            yield orjson.loads(record)
+
+
+class JsonDirectoryStore(SubmissionStore):
+    """
+    One JSON file per record, named by timestamp and signature. Lookups scan the directory, except digest lookups:
+    they use an in-memory map of (digest, team_email, submission_name) to the latest file, which only reads the files
+    added (by other processes) since the last lookup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._known = set()
+        self._seen_mtime = None
+        self._lock = threading.Lock()
+        self._digest_files = {}  # (submission_digest, team_email, submission_name) -> file name
+        self._indexed = set()  # files in _digest_files
+        self._digest_lock = threading.Lock()
+
+    def add(self, metadata: dict, payload: bytes, team_email: str, submission_name: str) -> dict:
+        clean_timestamp = metadata["time"].replace(":", "-").replace(", ", "-")
+        file_name = f"{clean_timestamp}_{metadata['signature'][:64]}.json"
+        # write to a temporary file first, so readers never see a partial record
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(splice_record(metadata, payload))
+        os.replace(tmp_path, os.path.join(self.path, file_name))
+        with self._digest_lock:
+            self._index_digest(file_name, metadata["submission_digest"], team_email, submission_name)
+        row = table_row({**metadata, "team_email": team_email, "submission_name": submission_name})
+        row["seq"] = self._seq(file_name)
+        return row
+
+    def _seq(self, file: str) -> int:
+        # file names only have second resolution, the modification time orders records within a second
+        return os.stat(os.path.join(self.path, file)).st_mtime_ns
+
+    def _files(self) -> list[str]:
+        return sorted(f for f in os.listdir(self.path) if f.endswith(".json"))
+
+    def _load(self, file: str) -> dict:
+        with open(os.path.join(self.path, file), "rb") as f:
+            return orjson.loads(f.read())
+
+    def get(self, signature: str) -> Optional[dict]:
+        for file in self._files():
+            if file.endswith(f"_{signature[:64]}.json"):
+                return self._load(file)
+        return None
+
+    def latest(self, team_email: str, submission_name: str) -> Optional[dict]:
+        latest = None
+        for record in self.iter_records():
+            if record.get("team_email") == team_email and record.get("submission_name") == submission_name:
+                latest = record
+        return latest
+
+    def _index_digest(self, file: str, submission_digest: str, team_email: str, submission_name: str):
+        key = (submission_digest, team_email, submission_name)
+        # file names start with the timestamp, the latest file of a key wins
+        if key not in self._digest_files or self._digest_files[key] < file:
+            self._digest_files[key] = file
+        self._indexed.add(file)
+
+    def find(self, submission_digest: str, team_email: str, submission_name: str) -> Optional[dict]:
+        with self._digest_lock:
+            for file in self._files():
+                if file in self._indexed:
+                    continue
+                try:
+                    record = self._load(file)
+                except (OSError, ValueError):
+                    continue  # unreadable file, retry on next lookup
+                self._index_digest(file, record.get("submission_digest"), record.get("team_email"),
+                                   record.get("submission_name"))
+            file = self._digest_files.get((submission_digest, team_email, submission_name))
+        return self._load(file) if file else None
+
+    def poll(self) -> list[dict]:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if mtime == self._seen_mtime:
+            return []
+
+        with self._lock:
+            rows = []
+            for file in self._files():
+                if file in self._known:
+                    continue
+                try:
+                    rows.append({**table_row(self._load(file)), "seq": self._seq(file)})
+                    self._known.add(file)
+                except (OSError, ValueError):
+                    mtime = None  # unreadable file, retry on next poll
+            # directory mtime resolution can be coarse, only trust it once it is old enough
+            if mtime is not None and time.time_ns() - mtime > 1_000_000_000:
+                self._seen_mtime = mtime
+            return sorted(rows, key=lambda row: row["seq"])
+
+    def iter_records(self) -> Iterator[dict]:
+        # file names sort by signature within a second, the modification time keeps the insertion order
+        for file in sorted(self._files(), key=lambda file: (file.split("_", 1)[0], self._seq(file))):
+            yield self._load(file)
+
+
+def open_store(backend: str, path: str) -> SubmissionStore:
+    """Open the storage backend ('sqlite' or 'json') in the SUBMISSIONS_PATH directory."""
+    os.makedirs(path, exist_ok=True)
+    if backend == "json":
+        return JsonDirectoryStore(path)
+    if backend == "sqlite":
+        return SQLiteStore(os.path.join(path, SQLITE_FILE_NAME))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def import_json_directory(directory: str, store: SQLiteStore) -> tuple[int, int]:
+    """Import all JSON records of a directory into the database, keeping their original bytes."""
+    imported, skipped = 0, 0
+    for file in sorted(f for f in os.listdir(directory) if f.endswith(".json")):
+        with open(os.path.join(directory, file), "rb") as f:
+            raw = f.read()
+        record = orjson.loads(raw)
+        if store.insert(raw, table_row(record), record["submission_digest"]):
+            imported += 1
+        else:
+            skipped += 1
+    return imported, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submission store maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    importer = subparsers.add_parser("import", help="import a directory of JSON records into the SQLite store")
+    importer.add_argument("directory")
+    importer.add_argument("database", nargs="?", help=f"defaults to <directory>/{SQLITE_FILE_NAME}")
+    args = parser.parse_args()
+
+    store = SQLiteStore(args.database or os.path.join(args.directory, SQLITE_FILE_NAME))
+    imported, skipped = import_json_directory(args.directory, store)
+    print(f"Imported {imported} records, skipped {skipped} already stored records.")
+
+
+if __name__ == "__main__":
+    main()
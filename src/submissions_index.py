@@ -0,0 +1,129 @@
+import bisect
+import hashlib
+import json
+import threading
+from typing import Optional
+
+PUBLIC_FIELDS = ("time", "submission_name", "signature")
+
+
+class SubmissionsIndex:
+    """
+    Process-wide index of the (time, submission_name, signature) rows shown in the submissions table.
+
+    Only the latest submission per team_email and submission_name is listed. The index is built once from the
+    submission store and afterwards only updated incrementally: submissions stored by this process are added
+    directly, records appended by other workers are picked up by polling the store.
+    The JSON payload and its ETag are precomputed whenever the rows change, and subscribers (e.g. the live
+    submissions stream) are notified with the new or overwritten rows. Rows are kept sorted by (time, signature),
+    so pages and time ranges are located by binary search.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._rows = {}  # (team_email, submission_name) -> row
+        self._lock = threading.Lock()
+        self._snapshot = (b"[]", self.make_etag(b"[]"))
+        self._sorted = ([], [])  # ascending (time, signature) keys and the public rows
+        self._replaces = {}  # signature -> signature of the overwritten submission
+        self._subscribers = set()
+
+    @staticmethod
+    def make_etag(payload: bytes) -> str:
+        return f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+
+    def subscribe(self, callback):
+        """Register a callable receiving a list of new or changed rows. It must not block."""
+        self._subscribers.add(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.discard(callback)
+
+    def _publish(self, rows: list):
+        for callback in list(self._subscribers):
+            callback(rows)
+
+    @staticmethod
+    def _key(row: dict) -> tuple[str, str]:
+        return row["time"] or "", row["signature"]
+
+    @staticmethod
+    def _order(row: dict) -> tuple[str, int]:
+        # timestamps have second resolution, the position in the store orders submissions within a second
+        return row["time"] or "", row.get("seq") or 0
+
+    def _rebuild(self):
+        rows = sorted(({k: row[k] for k in PUBLIC_FIELDS} for row in self._rows.values()), key=self._key)
+        self._sorted = ([self._key(row) for row in rows], rows)
+        payload = json.dumps(rows[::-1], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._snapshot = (payload, self.make_etag(payload))
+
+    def _merge(self, rows: list[dict]):
+        """Apply rows, a later row (by time, then store position) of the same team and name replaces the other."""
+        changed = []
+        with self._lock:
+            for row in rows:
+                key = (row["team_email"], row["submission_name"])
+                previous = self._rows.get(key)
+                if previous and (previous["signature"] == row["signature"] or self._order(previous) > self._order(row)):
+                    continue
+                self._rows[key] = row
+                public = {k: row[k] for k in PUBLIC_FIELDS}
+                if previous:
+                    public["replaces"] = self._replaces[row["signature"]] = previous["signature"]
+                changed.append(public)
+            if changed:
+                self._rebuild()
+                self._publish(changed)
+
+    def refresh(self):
+        """Pick up records appended by other processes since the last poll."""
+        rows = self.store.poll()
+        if rows:
+            self._merge(rows)
+
+    def add(self, row: dict):
+        """Add (or overwrite) the row of a submission stored by this process."""
+        self._merge([row])
+
+    def current(self, team_email: str, submission_name: str) -> Optional[dict]:
+        """The row of the latest submission of a team's submission name, including other workers' submissions."""
+        self.refresh()
+        return self._rows.get((team_email, submission_name))
+
+    def snapshot(self) -> tuple[bytes, str]:
+        """Return the pre-sorted JSON payload and its ETag."""
+        self.refresh()
+        return self._snapshot
+
+    def query(self, after: Optional[tuple[str, str]] = None, limit: Optional[int] = None,
+              name_prefix: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+              since: Optional[str] = None) -> tuple[list[dict], Optional[tuple[str, str]]]:
+        """
+        Rows newest first, starting after the (time, signature) cursor `after`, filtered by submission_name prefix
+        and the inclusive time range [start, end] (a date as `end` includes the whole day). `since` is an inclusive
+        lower time bound that additionally reports the overwritten submission of each row as "replaces", for applying
+        deltas to a client-side table.
+        Returns at most `limit` rows and the cursor of the next page (None on the last page).
+        """
+        self.refresh()
+        keys, rows = self._sorted
+        hi = len(keys)
+        if after:
+            hi = bisect.bisect_left(keys, after)
+        if end:
+            # a partial time (e.g. a date) includes all times it is a prefix of
+            hi = min(hi, bisect.bisect_left(keys, (end + "\uffff",)))
+        lo = bisect.bisect_left(keys, (max(start or "", since or ""),))
+
+        page = []
+        for idx in range(hi - 1, lo - 1, -1):
+            row = rows[idx]
+            if name_prefix and not row["submission_name"].startswith(name_prefix):
+                continue
+            if limit and len(page) == limit:
+                return page, self._key(page[-1])
+            if since and row["signature"] in self._replaces:
+                row = {**row, "replaces": self._replaces[row["signature"]]}
+            page.append(row)
+        return page, None
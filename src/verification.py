@@ -0,0 +1,138 @@
+"""
+Offline re-verification of stored submission records.
+
+Every record's submission_digest is recomputed from the stored answers and its TSP token is verified against the
+digest (or the Merkle root of its batch) and the trust roots of TSP_CA_FILE. The CPU-bound ASN.1 parsing and
+signature checks run in a process pool, the archive is streamed in chunks:
+
+    python -m src.verification --report temp/verification_report.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional
+
+from src.canonical import record_payload
+from src.merkle import root_from_proof
+
+TIMESTAMP_FORMAT = "%Y-%m-%d, %H:%M:%S"
+CHUNK_SIZE = 256
+
+
+def verify_record(record: dict, verify: Callable[[bytes, bytes], object]) -> dict:
+    """
+    Check a stored record: its digest, signature, Merkle proof and TSP token (with verify(token, digest), which
+    raises on invalid tokens). Returns {"verified": True, "timestamp": ...} or {"verified": False, "error": ...}.
+    """
+    try:
+        digest = hashlib.sha512(record_payload(record)).digest()
+        if digest.hex() != record["submission_digest"]:
+            raise ValueError("Stored payload does not match the submission digest")
+        timestamped_digest = digest
+        signed = record["tsp_signature"]
+        if "merkle_proof" in record:
+            timestamped_digest = root_from_proof(digest, record["merkle_proof"])
+            if timestamped_digest.hex() != record["merkle_root"]:
+                raise ValueError("Merkle proof does not lead to the timestamped root")
+            signed += record["submission_digest"]
+        if hashlib.sha256(signed.encode("utf-8")).hexdigest()[:64] != record["signature"]:
+            raise ValueError("Signature does not match the TSP token")
+        verified = verify(bytes.fromhex(record["tsp_signature"]), timestamped_digest)
+        timestamp = verified.tst_info["gen_time"].strftime(TIMESTAMP_FORMAT)
+        if timestamp != record["time"]:
+            raise ValueError(f"TSP timestamp {timestamp} does not match the stored time")
+        return {"verified": True, "timestamp": timestamp}
+    except Exception as e:
+        return {"verified": False, "error": f"{type(e).__name__}: {e}"}
+
+
+_verifier = None
+
+
+def _init_worker(ca_pem_file: Optional[str]):
+    from tsp_client import TSPVerifier
+
+    global _verifier
+    _verifier = TSPVerifier(ca_pem_file=ca_pem_file)
+
+
+def _verify_chunk(records: list[dict]) -> list[dict]:
+    """Failures of a chunk of records, verified in a worker process."""
+    failures = []
+    for record in records:
+        result = verify_record(record, lambda token, digest: _verifier.verify(token, message_digest=digest))
+        if not result["verified"]:
+            failures.append({k: record.get(k) for k in ("signature", "time", "team_email", "submission_name")}
+                            | {"error": result["error"]})
+    return failures
+
+
+def _chunks(records: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def verify_archive(records: Iterable[dict], ca_pem_file: Optional[str] = None, workers: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Verify all records in a process pool. At most two chunks per worker are pending at a time, so the archive is
+    never loaded into memory as a whole. Returns the report with the failed records.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.monotonic()
+    total, failures, pending = 0, [], set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ca_pem_file,)) as pool:
+        for chunk in _chunks(records, chunk_size):
+            total += len(chunk)
+            pending.add(pool.submit(_verify_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    failures += future.result()
+        for future in pending:
+            failures += future.result()
+    return {"total": total, "verified": total - len(failures), "failed": len(failures),
+            "duration": round(time.monotonic() - start, 3),
+            "failures": sorted(failures, key=lambda f: (f["time"] or "", f["signature"] or ""))}
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from src.storage import open_store
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Re-verify all stored submission records offline")
+    parser.add_argument("--path", default=os.getenv("SUBMISSIONS_PATH"), help="defaults to SUBMISSIONS_PATH")
+    parser.add_argument("--backend", default=os.getenv("STORAGE_BACKEND") or "sqlite", choices=("sqlite", "json"))
+    parser.add_argument("--ca-file", default=os.getenv("TSP_CA_FILE") or None,
+                        help="trust roots of the TSA, defaults to TSP_CA_FILE or the certifi CA bundle")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the CPU count")
+    parser.add_argument("--report", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    store = open_store(args.backend, args.path)
+    report = verify_archive(store.iter_records(), ca_pem_file=args.ca_file, workers=args.workers)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    print(f"Verified {report['verified']} of {report['total']} records in {report['duration']} s, "
+          f"{report['failed']} failed.", file=sys.stderr)
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,219 @@
+"""
+Client for checking and submitting many submission files.
+
+Files are checked in batches via /check-submissions and the ones without issues are submitted concurrently with
+their check token, over one pooled HTTP session. Rate limited or busy requests (429/503/504), connection errors and
+timeouts are retried with exponential backoff, honoring Retry-After (the server deduplicates repeated submissions). Submitted files are recorded in a journal (JSON Lines) by
+the SHA-256 of their content, so reruns skip them.
+
+    python submit_via_API.py submissions/ "experiments/*.json" --url http://127.0.0.1:8000 --concurrency 4
+"""
+import argparse
+import email.utils
+import glob
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_URL = "https://rag.timetoact.at"
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+def find_submission_files(patterns: Iterable[str]) -> list[str]:
+    """Submission files of directories (all *.json files), glob patterns or file paths, without duplicates."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths += sorted(glob.glob(os.path.join(pattern, "*.json")))
+        else:
+            paths += sorted(glob.glob(pattern)) or [pattern]
+    return list(dict.fromkeys(os.path.normpath(path) for path in paths))
+
+
+def retry_delay(response: Optional[requests.Response], attempt: int, backoff: float = 1.0,
+                max_delay: float = 60.0) -> float:
+    """Seconds to wait before the next attempt: Retry-After if the server sent it, exponential backoff otherwise."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        if retry_after.isdigit():
+            return min(float(retry_after), max_delay)
+        try:
+            return min(max(email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time(), 0), max_delay)
+        except (TypeError, ValueError):
+            pass
+    return min(backoff * 2 ** attempt, max_delay) * random.uniform(0.5, 1.0)
+
+
+class Journal:
+    """Append-only JSON Lines record of the submitted files, keyed by the SHA-256 of their content."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["digest"]] = entry
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self.entries
+
+    def add(self, entry: dict):
+        with self._lock:
+            self.entries[entry["digest"]] = entry
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
 
-SUBMISSION_JSON_PATH = r"test\samples\sample_answer.json"
+
+class SubmissionClient:
+    def __init__(self, url: str = DEFAULT_URL, concurrency: int = 4, timeout: float = 60, max_retries: int = 5,
+                 backoff: float = 1.0, journal: Optional[str] = None, batch_size: int = 50):
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.journal = Journal(journal)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["accept"] = "application/json"
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _post(self, path: str, **kwargs) -> requests.Response:
+        """POST with retries of connection errors, timeouts and 429/502/503/504 responses."""
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.post(self.url + path, timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            if attempt == self.max_retries:
+                return response
+            time.sleep(retry_delay(response, attempt, self.backoff))
+
+    def check(self, files: dict[str, bytes]) -> dict[str, dict]:
+        """Check the files (path -> content) in batches, returns the result per path."""
+        results = {}
+        items = list(files.items())
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            upload = [("files", (os.path.basename(path), content, "application/json")) for path, content in batch]
+            response = self._post("/check-submissions", files=upload)
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    result = json.loads(line)
+                    results[batch[result["index"]][0]] = result
+        return results
+
+    def submit(self, path: str, content: bytes, check_token: Optional[str] = None) -> dict:
+        data = {"check_token": check_token} if check_token else {}
+        try:
+            response = self._post("/submit", files={"file": (os.path.basename(path), content, "application/json")},
+                                  data=data)
+        except requests.RequestException as e:  # retries exhausted, the other files are still submitted
+            return {"status": "error", "detail": f"{type(e).__name__}: {e}"}
+        try:
+            result = response.json()
+        except ValueError:
+            result = {"detail": response.text}
+        if not response.ok:
+            return {"status": "error", "detail": result.get("detail", response.text)}
+        return result
+
+    def _submit_file(self, path: str, content: bytes, digest: str, check_token: Optional[str]) -> dict:
+        result = self.submit(path, content, check_token)
+        if result["status"] != "error":
+            receipt = result["response"]
+            self.journal.add({"digest": digest, "path": path, "time": receipt["time"],
+                              "submission_name": receipt["submission_name"], "signature": receipt["signature"],
+                              "receipt_url": receipt.get("receipt_url")})
+        return result
+
+    def run(self, paths: list[str], check_only: bool = False, submit_with_issues: bool = False) -> dict[str, dict]:
+        """Check all files and submit the ones without issues (unless check_only), returns the outcome per path."""
+        outcomes, files = {}, {}
+        for path in paths:
+            with open(path, "rb") as f:
+                content = f.read()
+            if hashlib.sha256(content).hexdigest() in self.journal:
+                outcomes[path] = {"status": "skipped", "detail": "already submitted"}
+            else:
+                files[path] = content
+        checks = self.check(files) if files else {}
+
+        to_submit = []
+        for path, check in checks.items():
+            outcomes[path] = check
+            if check_only or check["status"] == "invalid":
+                continue
+            if check["status"] == "issues found" and not submit_with_issues:
+                continue
+            to_submit.append(path)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {path: pool.submit(self._submit_file, path, files[path],
+                                         hashlib.sha256(files[path]).hexdigest(), checks[path].get("check_token"))
+                       for path in to_submit}
+            for path, future in futures.items():
+                outcomes[path] = future.result()
+        return outcomes
 
 
 def main():
-    # LOCAL
-    # url = "http://127.0.0.1:8000/check-submission"
-    # url = "http://127.0.0.1:8000/submit"
-
-    # PROD
-    # url = "https://rag.timetoact.at/check-submission"
-    url = "https://rag.timetoact.at/submit"
-
-    headers = {"accept": "application/json"}
-    files = {
-        "file": ("sample_answer.json", open(SUBMISSION_JSON_PATH, "rb"), "application/json")
-    }
-    response = requests.post(url, headers=headers, files=files)
-    print(response.json())
+    parser = argparse.ArgumentParser(description="Check and submit submission files")
+    parser.add_argument("paths", nargs="+", help="submission files, directories or glob patterns")
+    parser.add_argument("--url", default=DEFAULT_URL, help=f"API base URL (default: {DEFAULT_URL})")
+    parser.add_argument("--concurrency", type=int, default=4, help="max concurrent submissions")
+    parser.add_argument("--journal", default="submitted.jsonl",
+                        help="journal of submitted files, files in it are skipped (default: submitted.jsonl)")
+    parser.add_argument("--check-only", action="store_true", help="only check the files")
+    parser.add_argument("--submit-with-issues", action="store_true", help="also submit files with issues")
+    parser.add_argument("--timeout", type=float, default=60, help="timeout per request in seconds")
+    parser.add_argument("--max-retries", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = find_submission_files(args.paths)
+    with SubmissionClient(args.url, concurrency=args.concurrency, timeout=args.timeout,
+                          max_retries=args.max_retries, journal=args.journal) as client:
+        outcomes = client.run(paths, check_only=args.check_only, submit_with_issues=args.submit_with_issues)
+
+    for path in paths:
+        outcome = outcomes[path]
+        line = f"{path}: {outcome['status']}"
+        if "response" in outcome:
+            line += f" (signature {outcome['response']['signature']})"
+        if outcome.get("detail"):
+            line += f" - {outcome['detail']}"
+        print(line)
+        for issue in outcome.get("issues", []):
+            print(f"    {issue.strip()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+"""
+Load test of the submission API against the bundled offline TSP server.
+
+Starts the app with uvicorn on a prepopulated temporary submission store, drives /check-submission, /submit,
+/submit-ui and /submissions with the given concurrency and reports p50/p95/p99 latency and requests per second.
+Exits with code 1 if an endpoint regressed against the stored baseline by more than the tolerance.
+
+    python -m test.benchmark --concurrency 16 --requests 100 --store-size 1000
+    python -m test.benchmark --save-baseline
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.canonical import canonical_json
+from src.storage import open_store
+from test.tsp_server import LocalTSPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS_PATH = os.path.join(ROOT, "src", "static", "questions.json")
+BASELINE_PATH = os.path.join(ROOT, "test", "samples", "benchmark_baseline.json")
+ENDPOINTS = ["/check-submission", "/submit", "/submit-ui", "/submissions"]
+
+SAMPLE_VALUES = {"number": 42.5, "name": "Sample Name", "names": ["Sample A", "Sample B"], "boolean": True}
+
+
+def build_submission() -> dict:
+    """A valid submission answering every question of the question set."""
+    with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    return {
+        "team_email": "benchmark@rag-tat.com",
+        "submission_name": "benchmark",
+        "answers": [{"question_text": q["text"], "kind": q["kind"], "value": SAMPLE_VALUES[q["kind"]],
+                     "references": [{"pdf_sha1": "053b7cb83115789346e2a9efc7e2e640851653ff", "page_index": 3}]}
+                    for q in questions],
+    }
+
+
+def populate_store(path: str, size: int, submission: dict):
+    """Append `size` submission records to the default submission store in path."""
+    store = open_store("sqlite", path)
+    for i in range(size):
+        metadata = {"time": f"2025-02-27, {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+                    "signature": f"{i:064x}", "tsp_signature": "00" * 2048, "submission_digest": "00" * 64}
+        payload = canonical_json({**submission, "submission_name": f"{submission['submission_name']}-{i}"})
+        store.add(metadata, payload, submission["team_email"], f"{submission['submission_name']}-{i}")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(port: int, env: dict) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=ROOT, env={**os.environ, **env})
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{port}/submissions", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("App did not start")
+
+
+def make_request(base_url: str, endpoint: str, payload: bytes, sessions: threading.local) -> bool:
+    if not hasattr(sessions, "session"):
+        sessions.session = requests.Session()
+    session = sessions.session
+    if endpoint in ("/check-submission", "/submit"):
+        response = session.post(base_url + endpoint, files={"file": ("bench.json", payload, "application/json")})
+    elif endpoint == "/submit-ui":
+        response = session.post(base_url + endpoint, data={"content": payload.decode("utf-8")})
+    else:
+        response = session.get(base_url + endpoint)
+    return response.ok
+
+
+def run_endpoint(base_url: str, endpoint: str, payload: bytes, n_requests: int, concurrency: int) -> dict:
+    sessions = threading.local()
+    latencies, errors = [], 0
+
+    def timed(_):
+        start = time.perf_counter()
+        ok = make_request(base_url, endpoint, payload, sessions)
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, ok in executor.map(timed, range(n_requests)):
+            latencies.append(latency)
+            errors += not ok
+    duration = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50_ms": round(quantiles[49] * 1000, 2), "p95_ms": round(quantiles[94] * 1000, 2),
+            "p99_ms": round(quantiles[98] * 1000, 2), "rps": round(n_requests / duration, 2), "errors": errors}
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for endpoint, result in results.items():
+        base = baseline.get(endpoint)
+        if not base:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {result['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: {result['rps']} req/s < baseline {base['rps']} req/s")
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{endpoint}: {result['errors']} errors > baseline {base.get('errors', 0)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the submission API")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--store-size", type=int, default=1000, help="number of prepopulated submissions")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--tsp-latency", type=float, default=0.05, help="artificial TSP latency in seconds")
+    parser.add_argument("--tsp-error-rate", type=float, default=0.0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as new baseline")
+    args = parser.parse_args()
+
+    submission = build_submission()
+    payload = json.dumps(submission).encode("utf-8")
+    store = tempfile.mkdtemp(prefix="benchmark_submissions_")
+    populate_store(store, args.store_size, submission)
+    tsp_server = LocalTSPServer(latency=args.tsp_latency, error_rate=args.tsp_error_rate).start()
+    port = free_port()
+    # the same payload is posted over and over, deduplication would skip the signing the benchmark measures
+    app = start_app(port, {"SUBMISSIONS_PATH": store, "TSP_URL": tsp_server.url,
+                           "TSP_CA_FILE": tsp_server.ca_pem_file, "STORAGE_BACKEND": "sqlite", "DEVELOPMENT": "",
+                           "SUBMIT_DEDUP_WINDOW": "0"})
+
+    try:
+        results = {}
+        for endpoint in args.endpoints:
+            results[endpoint] = run_endpoint(f"http://127.0.0.1:{port}", endpoint, payload, args.requests,
+                                             args.concurrency)
+    finally:
+        app.terminate()
+        app.wait()
+        tsp_server.stop()
+        shutil.rmtree(store)
+
+    print(f"{'endpoint':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}")
+    for endpoint, r in results.items():
+        print(f"{endpoint:<20}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['rps']:>10}{r['errors']:>8}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:\n - " + "\n - ".join(regressions))
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+
+from test.tsp_server import LocalTSPServer
+
+local_tsp_server = None
+
+
+def pytest_configure(config):
+    """
+    Run the tests against the bundled offline TSP server instead of TSP_URL, unless TEST_WITH_REAL_TSP is set.
+    Must happen before src.main is imported, as the signing pool is configured at import.
+    """
+    global local_tsp_server
+    if os.getenv("TEST_WITH_REAL_TSP"):
+        return
+    local_tsp_server = LocalTSPServer().start()
+    os.environ["TSP_URL"] = local_tsp_server.url
+    os.environ["TSP_CA_FILE"] = local_tsp_server.ca_pem_file
+    # submissions stored by earlier runs were signed by another ephemeral CA, always sign again unless a test enables it
+    os.environ["SUBMIT_DEDUP_WINDOW"] = "0"
+
+
+def pytest_unconfigure(config):
+    if local_tsp_server:
+        local_tsp_server.stop()
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.admission import AdmissionController
+
+
+def test_queue_overflow_is_rejected_with_retry_after():
+    """
+    Submissions beyond the in-flight limit wait in the queue, beyond the queue size they are rejected with 503.
+    """
+    admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+    order = []
+
+    async def submit(name: str, duration: float):
+        async with admission.admit("team@example.com"):
+            order.append(name)
+            await asyncio.sleep(duration)
+
+    async def scenario():
+        first = asyncio.create_task(submit("first", 0.2))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(submit("queued", 0))
+        await asyncio.sleep(0.01)
+        assert admission.stats() == {"in_flight": 1, "queued": 1}
+        with pytest.raises(HTTPException) as e:
+            await submit("rejected", 0)
+        await asyncio.gather(first, queued)
+        return e.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert order == ["first", "queued"]
+    assert admission.stats() == {"in_flight": 0, "queued": 0}
+
+
+def test_queue_timeout_releases_waiter():
+    admission = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.05)
+
+    async def scenario():
+        async with admission.admit("a@example.com"):
+            with pytest.raises(HTTPException) as e:
+                await admission.acquire("b@example.com")
+            assert admission.stats()["queued"] == 0
+        return e.value
+
+    assert asyncio.run(scenario()).status_code == 503
+    assert admission.stats() == {"in_flight": 0, "queued": 0}
+
+
+def test_team_token_bucket():
+    """
+    A team can submit a burst, further submissions get 429 until the bucket refills. Other teams are not affected.
+    """
+    admission = AdmissionController(team_rate=6, team_burst=2)  # one token every 10 seconds
+
+    async def scenario():
+        for _ in range(2):
+            async with admission.admit("a@example.com"):
+                pass
+        with pytest.raises(HTTPException) as e:
+            await admission.acquire("a@example.com")
+        async with admission.admit("b@example.com"):
+            pass
+        return e.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert 9 <= int(rejected.headers["Retry-After"]) <= 10
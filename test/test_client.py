@@ -0,0 +1,95 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+import requests
+import uvicorn
+
+from src.main import app
+from submit_via_API import SubmissionClient, find_submission_files, retry_delay
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    # without lifespan: shutting down would close the signing pool the other tests share
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+
+def test_client_checks_submits_and_skips_journaled_files(server_url, tmp_path):
+    """
+    Checked files are submitted with their check token, broken files are only reported. A rerun skips the files
+    recorded in the journal.
+    """
+    with open("test/samples/sample_answer.json", encoding="utf-8") as f:
+        submission = json.load(f)
+    directory = tmp_path / "submissions"
+    directory.mkdir()
+    for i in range(3):
+        (directory / f"variant-{i}.json").write_text(
+            json.dumps({**submission, "submission_name": f"client-test-{i}"}), encoding="utf-8")
+    (directory / "broken.json").write_text("{not json", encoding="utf-8")
+    paths = find_submission_files([str(directory)])
+    journal = str(tmp_path / "submitted.jsonl")
+
+    with SubmissionClient(server_url, concurrency=2, journal=journal) as client:
+        checked = client.run(paths, check_only=True)
+        assert checked[str(directory / "broken.json")]["status"] == "invalid"
+        outcomes = client.run(paths, submit_with_issues=True)
+    assert outcomes[str(directory / "broken.json")]["status"] == "invalid"
+    for i in range(3):
+        outcome = outcomes[str(directory / f"variant-{i}.json")]
+        assert outcome["status"] in ("success", "issues found") and "response" in outcome
+    with open(journal, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+
+    with SubmissionClient(server_url, journal=journal) as client:
+        outcomes = client.run(paths, submit_with_issues=True)
+    assert [outcome["status"] for outcome in outcomes.values()].count("skipped") == 3
+
+
+def test_retry_delay_honors_retry_after():
+    response = requests.Response()
+    response.headers["Retry-After"] = "7"
+    assert retry_delay(response, attempt=0) == 7
+    assert retry_delay(response, attempt=0, max_delay=5) == 5
+    assert 2 <= retry_delay(None, attempt=2, backoff=1) <= 4
+
+
+def test_client_retries_timeouts(server_url):
+    """
+    A timed out submission is retried, once the retries are exhausted it is reported as error outcome.
+    """
+    with open("test/samples/sample_answer.json", encoding="utf-8") as f:
+        content = json.dumps({**json.load(f), "submission_name": "client-timeout"}).encode("utf-8")
+
+    with SubmissionClient(server_url, max_retries=1, backoff=0) as client:
+        post, calls = client.session.post, []
+
+        def slow_once(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 1:
+                raise requests.ReadTimeout("read timed out")
+            return post(url, **kwargs)
+
+        client.session.post = slow_once
+        assert client.submit("timeout.json", content)["status"] in ("success", "issues found")
+        assert len(calls) == 2
+
+        def always_slow(url, **kwargs):
+            raise requests.ReadTimeout("read timed out")
+
+        client.session.post = always_slow
+        result = client.submit("timeout.json", content)
+    assert result == {"status": "error", "detail": "ReadTimeout: read timed out"}
@@ -1,7 +1,22 @@
+import asyncio
+import copy
+import hashlib
 import json
+import os
+import re
+import httpx
 import pytest
 from fastapi.testclient import TestClient
-from src.main import app  # Adjust if your main file is named differently
+from src import main
+from src.admission import AdmissionController
+from src.main import app, submission_store, validation_cache  # Adjust if your main file is named differently
+from src.canonical import canonical_json, record_payload
+from src.questions import ReloadableQuestions
+from src.settings import get_settings, replace_settings
+from src.static_files import PrecompressedStaticFiles
+from src.storage import JsonDirectoryStore, SQLiteStore
+from src.submissions_index import SubmissionsIndex
+from src.validation_cache import ValidationCache
 
 client = TestClient(app)
 
@@ -45,6 +60,50 @@ def test_serve_index():
     assert "text/html" in response.headers["content-type"]
 
 
+def test_index_and_static_files_are_cached():
+    """
+    The index links content-hashed static URLs, which are immutable; everything is revalidated with ETags.
+    """
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]}
+                      ).status_code == 304
+
+    script_url = re.search(r'<script src="(static/logic\.js\?v=\w+)"', response.text).group(1)
+    response = client.get("/" + script_url, headers={"Accept-Encoding": "br, gzip"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["content-encoding"] in ("br", "gzip")
+    with open("src/static/logic.js", "rb") as f:
+        assert response.content == f.read()
+
+    response = client.get("/static/logic.js?v=outdated", headers={"Accept-Encoding": "identity"})
+    assert response.headers["cache-control"] == "no-cache"
+    assert "content-encoding" not in response.headers
+    assert client.get("/static/logic.js", headers={"Accept-Encoding": "identity",
+                                                   "If-None-Match": response.headers["etag"]}).status_code == 304
+
+    # PNGs are already compressed
+    response = client.get("/static/assets/fav_ttg.png", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and "content-encoding" not in response.headers
+    assert client.get("/static/../main.py").status_code == 404
+    assert client.get("/static/missing.js").status_code == 404
+
+
+def test_static_files_pick_up_changes(tmp_path):
+    """
+    Changed files get a new version, so pages linking them are rendered again.
+    """
+    (tmp_path / "app.js").write_text("console.log(1);")
+    static_files = PrecompressedStaticFiles(str(tmp_path))
+    url, generation = static_files.url("app.js"), static_files.generation
+
+    (tmp_path / "app.js").write_text("console.log(22);")
+    assert static_files.url("app.js") != url
+    assert static_files.generation > generation
+    assert static_files.get("app.js").variants[None] == b"console.log(22);"
+
+
 def test_check_submission_correct_json(valid_submission_json):
     """
     Test /check-submission with correct submission JSON file.
@@ -171,7 +230,7 @@ def test_submit_valid_submission(valid_submission_json):
     # Should return a response ID and signature
     assert "response" in data
     assert "signature" in data["response"]
-    assert "tsp_verification_data" in data["response"]
+    assert "receipt_url" in data["response"]
 
 
 def test_submissions_list_after_submit(valid_submission_json):
@@ -185,7 +244,7 @@ def test_submissions_list_after_submit(valid_submission_json):
     )
     submit_data = submit_response.json()
     assert submit_response.status_code == 200
-    assert "tsp_verification_data" in submit_data["response"]
+    assert "submission_digest" in submit_data["response"]
 
     # Now get /submissions
     get_response = client.get("/submissions")
@@ -194,3 +253,584 @@ def test_submissions_list_after_submit(valid_submission_json):
     last_id = submit_data["response"]["signature"]
     assert any(s["signature"] == last_id for s in submissions_list), \
         "Expected newly submitted id to be in the submissions list."
+
+
+def test_submissions_etag_not_modified():
+    """
+    Polling /submissions with the returned ETag should be answered with 304 as long as nothing changed.
+    """
+    first = client.get("/submissions")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get("/submissions", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+
+
+def test_submissions_index_picks_up_external_files(tmp_path):
+    """
+    Records written by other workers should show up in the index without a full reload.
+    """
+    index = SubmissionsIndex(JsonDirectoryStore(str(tmp_path)))
+    index.refresh()
+    payload, etag = index.snapshot()
+    assert json.loads(payload) == []
+
+    record = {"time": "2025-02-27, 10:00:00", "submission_name": "other-worker", "signature": "abc",
+              "team_email": "test@rag-tat.com", "answers": [{"value": 1}]}
+    (tmp_path / "2025-02-27-10-00-00_abc.json").write_text(json.dumps(record), encoding="utf-8")
+    os.utime(tmp_path, ns=(0, 0))  # make sure the directory mtime differs from the last scan
+
+    payload, new_etag = index.snapshot()
+    assert new_etag != etag
+    assert json.loads(payload) == [{"time": "2025-02-27, 10:00:00", "submission_name": "other-worker",
+                                    "signature": "abc"}]
+
+
+def test_submissions_index_notifies_subscribers(tmp_path):
+    """
+    Subscribers of the index (the live submissions stream) should receive only new or overwritten rows.
+    """
+    index = SubmissionsIndex(JsonDirectoryStore(str(tmp_path)))
+    received = []
+    index.subscribe(received.append)
+
+    row = {"time": "2025-02-27, 10:00:00", "submission_name": "live", "signature": "def",
+           "team_email": "test@rag-tat.com"}
+    index.add(row)
+    assert received == [[{"time": "2025-02-27, 10:00:00", "submission_name": "live", "signature": "def"}]]
+
+    index.add({**row, "time": "2025-02-27, 10:00:01", "signature": "ghi"})
+    assert received[-1] == [{"time": "2025-02-27, 10:00:01", "submission_name": "live", "signature": "ghi",
+                             "replaces": "def"}]
+    assert [r["signature"] for r in json.loads(index.snapshot()[0])] == ["ghi"]
+
+    index.unsubscribe(received.append)
+    index.add({**row, "submission_name": "other", "signature": "jkl"})
+    assert len(received) == 2
+
+
+def test_submission_streams_end_on_shutdown(monkeypatch):
+    """
+    Open submission streams end once the shutdown begins, instead of holding the server until SHUTDOWN_TIMEOUT.
+    """
+    monkeypatch.setattr(main, "streams_ended", False)
+
+    async def stream_until_shutdown() -> bytes:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            response = asyncio.ensure_future(async_client.get("/submissions/stream"))
+            while not main.stream_queues:
+                await asyncio.sleep(0.01)
+            main.end_streams()
+            return (await asyncio.wait_for(response, timeout=5)).content
+
+    body = asyncio.run(stream_until_shutdown())
+    assert body.startswith(b"event: snapshot\n")
+    assert not main.stream_queues
+
+
+def test_submissions_index_orders_same_second_by_store_position(tmp_path):
+    """
+    Of two submissions within the same second the later stored one is listed, also when it is merged first.
+    """
+    store = SQLiteStore(str(tmp_path / "submissions.sqlite3"))
+    index = SubmissionsIndex(store)
+    metadata = {"time": "2025-02-27, 10:00:00", "tsp_signature": "00", "submission_digest": "ff"}
+    payload = canonical_json({"answers": [], "submission_name": "same-second", "team_email": "test@rag-tat.com"})
+    store.add({**metadata, "signature": "a" * 64}, payload, "test@rag-tat.com", "same-second")
+    index.add(store.add({**metadata, "signature": "b" * 64}, payload, "test@rag-tat.com", "same-second"))
+    index.refresh()  # the earlier record arrives last
+    assert [r["signature"] for r in json.loads(index.snapshot()[0])] == ["b" * 64]
+
+
+def test_submissions_index_pages_and_filters(tmp_path):
+    """
+    Pages follow each other without gaps, filters and deltas only return the matching rows.
+    """
+    index = SubmissionsIndex(JsonDirectoryStore(str(tmp_path)))
+    for i in range(5):
+        index.add({"time": f"2025-02-27, 10:00:0{i}", "submission_name": f"exp-{i % 2}", "signature": f"s{i}",
+                   "team_email": "test@rag-tat.com" if i < 4 else "other@rag-tat.com"})
+    # overwrites exp-0 of test@rag-tat.com (s2)
+    index.add({"time": "2025-02-27, 10:00:05", "submission_name": "exp-0", "signature": "s5",
+               "team_email": "test@rag-tat.com"})
+
+    page, cursor = index.query(limit=2)
+    assert [r["signature"] for r in page] == ["s5", "s4"]
+    page, cursor = index.query(after=cursor, limit=2)
+    assert [r["signature"] for r in page] == ["s3"]
+    assert cursor is None
+
+    page, _ = index.query(name_prefix="exp-1")
+    assert [r["signature"] for r in page] == ["s3"]
+    page, _ = index.query(start="2025-02-27, 10:00:03", end="2025-02-27, 10:00:04")
+    assert [r["signature"] for r in page] == ["s4", "s3"]
+    page, _ = index.query(start="2025-02-27", end="2025-02-27")  # whole day
+    assert [r["signature"] for r in page] == ["s5", "s4", "s3"]
+    assert index.query(end="2025-02-26")[0] == []
+    page, _ = index.query(since="2025-02-27, 10:00:05")
+    assert page == [{"time": "2025-02-27, 10:00:05", "submission_name": "exp-0", "signature": "s5",
+                     "replaces": "s2"}]
+
+
+def test_submissions_endpoint_pagination_and_compression(valid_submission_json, monkeypatch):
+    for i in range(3):
+        payload = json.dumps({**valid_submission_json, "submission_name": f"pagination-test-{i}"})
+        assert client.post("/submit-ui", data={"content": payload}).status_code == 200
+
+    first = client.get("/submissions", params={"limit": 2, "name_prefix": "pagination-test-"})
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    next_url = first.links["next"]["url"]
+    second = client.get(next_url)
+    assert len(second.json()) == 1 and "next" not in second.links
+    assert {r["submission_name"] for r in first.json() + second.json()} == {f"pagination-test-{i}" for i in range(3)}
+
+    assert client.get("/submissions", params={"after": "no-cursor"}).status_code == 400
+
+    monkeypatch.setattr("src.compression.MIN_SIZE", 0)  # compress even a short table
+    compressed = client.get("/submissions", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.content == client.get("/submissions", headers={"Accept-Encoding": "identity"}).content
+    not_modified = client.get("/submissions", headers={"Accept-Encoding": "gzip",
+                                                       "If-None-Match": compressed.headers["etag"]})
+    assert not_modified.status_code == 304
+
+
+def test_check_submission_matches_answers_by_question_text():
+    """
+    Answers are matched to questions by their text, so reordered answers are validated against the right kind.
+    Unknown and duplicate questions are reported.
+    """
+    with open("src/static/questions.json", "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    assert (questions[0]["kind"], questions[1]["kind"]) == ("number", "boolean")
+
+    submission = {
+        "team_email": "test@rag-tat.com",
+        "submission_name": "test-team",
+        "answers": [
+            {"question_text": questions[1]["text"].upper(), "value": "yes", "references": []},
+            {"question_text": questions[0]["text"], "value": "12", "references": []},
+            {"question_text": questions[0]["text"], "value": "13", "references": []},
+            {"question_text": "What is the meaning of life?", "value": 42, "references": []},
+        ]
+    }
+    response = client.post("/check-submission",
+                           files={"file": ("reordered.json", json.dumps(submission), "application/json")})
+    assert response.status_code == 200
+    issues = "".join(response.json()["issues"])
+    assert "Expected" not in issues
+    assert f"Missing answers for {len(questions) - 2} of {len(questions)} questions" in issues
+    assert "Unknown question (answer index 3)" in issues
+    assert "... and 1 more question mismatches" in issues
+
+
+def test_reload_questions_requires_admin_token():
+    response = client.post("/admin/reload-questions")
+    assert response.status_code == 403
+
+
+def test_reload_questions_swaps_catalogue(tmp_path):
+    """
+    Reloading compiles the changed questions file and swaps it in, a broken file keeps the previous catalogue.
+    """
+    questions_file = tmp_path / "questions.json"
+    questions_file.write_text(json.dumps([{"text": "First question?", "kind": "number"}]), encoding="utf-8")
+    reloadable = ReloadableQuestions(str(questions_file))
+    old_catalogue = reloadable.catalogue
+
+    questions_file.write_text(json.dumps([{"text": "First question?", "kind": "number"},
+                                          {"text": "Second question?", "kind": "boolean"}]), encoding="utf-8")
+    os.utime(questions_file, ns=(0, 0))
+    assert reloadable.reload_if_changed()
+    assert len(reloadable.catalogue) == 2 and len(old_catalogue) == 1
+    assert reloadable.catalogue.index["secondquestion"] == (1, "boolean")
+
+    questions_file.write_text("not json", encoding="utf-8")
+    os.utime(questions_file, ns=(1, 1))
+    assert not reloadable.reload_if_changed()
+    assert len(reloadable.catalogue) == 2
+
+
+def test_reload_questions_endpoint():
+    previous = get_settings()
+    replace_settings(previous.model_copy(update={"admin_token": "secret"}))
+    try:
+        non_ascii = {"Authorization": "Bearer é".encode("utf-8")}
+        assert client.post("/admin/reload-questions", headers=non_ascii).status_code == 403
+        response = client.post("/admin/reload-questions", headers={"Authorization": "Bearer secret"})
+    finally:
+        replace_settings(previous)
+    assert response.status_code == 200
+    assert response.json()["status"] == "reloaded"
+
+
+def test_reload_settings_endpoint():
+    """
+    The snapshot is replaced by the settings of the environment and .env, the changed settings are reported.
+    """
+    previous = get_settings()
+    replace_settings(previous.model_copy(update={"admin_token": "secret", "max_json_size": 1}))
+    try:
+        response = client.post("/admin/reload-settings", headers={"Authorization": "Bearer secret"})
+        assert response.status_code == 200
+        assert "MAX_JSON_SIZE" in response.json()["changed"]
+        assert get_settings().max_json_size == previous.max_json_size
+    finally:
+        replace_settings(previous)
+
+
+def test_oversized_upload_rejected_by_content_length():
+    """
+    A declared Content-Length above the limit is answered with 413 before the body is read.
+    """
+    max_size = get_settings().max_json_size
+    response = client.post("/submit", content=b"x" * (2 * max_size),
+                           headers={"Content-Type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
+
+
+def test_oversized_upload_rejected_while_streaming():
+    """
+    Without Content-Length, the upload is aborted as soon as the received body crosses the limit.
+    """
+    max_size = get_settings().max_json_size
+
+    def body():
+        for _ in range(4 * max_size // 65536):
+            yield b"x" * 65536
+
+    response = client.post("/check-submission", content=body(),
+                           headers={"Content-Type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
+
+
+def test_oversized_json_file_rejected(valid_submission_json):
+    """
+    A JSON file just above MAX_JSON_SIZE within a multipart body below the body limit is rejected while reading.
+    """
+    max_size = get_settings().max_json_size
+    valid_submission_json["submission_name"] = "x" * max_size
+    response = client.post("/check-submission",
+                           files={"file": ("large.json", json.dumps(valid_submission_json), "application/json")})
+    assert response.status_code == 413
+    assert "too large" in response.json()["detail"]
+
+
+def test_submission_digest_is_canonical_json(valid_submission_json):
+    """
+    The digest covers canonical JSON (sorted keys, no whitespace) that can be reproduced outside Python,
+    from the receipt as well as from the stored record.
+    """
+    response = client.post("/submit", params={"verification_data": True},
+                           files={"file": ("valid.json", json.dumps(valid_submission_json), "application/json")})
+    assert response.status_code == 200, response.text
+    data = response.json()["response"]["tsp_verification_data"]
+
+    payload = json.loads(data["submission"])
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    assert canonical == data["submission"]
+    assert hashlib.sha512(canonical.encode("utf-8")).hexdigest() == data["submission_digest"]
+
+    record = submission_store.get(response.json()["response"]["signature"])
+    stored_payload = {k: record[k] for k in ("answers", "submission_name", "team_email")}
+    assert stored_payload == payload
+    assert record["submission_digest"] == data["submission_digest"]
+
+
+def test_integers_beyond_64_bits_are_rejected(valid_submission_json):
+    """
+    Stored records are read back with orjson, larger integers would come back as floats and fail verification.
+    The largest accepted page index round-trips through the receipt.
+    """
+    submission = copy.deepcopy(valid_submission_json)
+    submission["submission_name"] = "big-page-index"
+    submission["answers"][0]["references"] = [{"pdf_sha1": "a", "page_index": 123456789012345678901234567890}]
+    response = client.post("/submit-ui", data={"content": json.dumps(submission)})
+    assert response.status_code == 400
+    assert "page_index" in response.json()["detail"]
+
+    submission["answers"][0]["references"][0]["page_index"] = 2**63 - 1
+    response = client.post("/submit-ui", data={"content": json.dumps(submission)})
+    assert response.status_code == 200, response.text
+    bundle = client.get(response.json()["response"]["receipt_url"]).json()
+    assert bundle["verification"]["verified"] is True
+    assert f'"page_index":{2**63 - 1}' in bundle["tsp_verification_data"]["submission"]
+
+
+@pytest.mark.parametrize("value", ["NaN", "Infinity", "-Infinity", '"inf"'])
+def test_non_finite_numbers_are_rejected(valid_submission_json, value):
+    """
+    NaN and infinite values have no JSON representation, the signed payload would differ from the submitted one.
+    """
+    submission = json.dumps(valid_submission_json)
+    content = submission.replace(json.dumps(valid_submission_json["answers"][0]["value"]), value, 1)
+    assert content != submission
+    response = client.post("/submit-ui", data={"content": content})
+    assert response.status_code == 400
+    assert "finite number" in response.json()["detail"]
+    response = client.post("/check-submission", files={"file": ("nan.json", content, "application/json")})
+    assert response.status_code == 400
+
+
+def test_repeated_submission_returns_original_receipt(valid_submission_json, monkeypatch):
+    """
+    Within the dedup window an identical submission is signed once, also when the duplicates arrive concurrently.
+    Submitting an earlier version again makes it the current one, so it is signed again.
+    """
+    previous = get_settings()
+    replace_settings(previous.model_copy(update={"submit_dedup_window": 600}))
+    signings = []
+    sign = main.sign_with_tsp_server
+
+    async def counting_sign(payload):
+        signings.append(payload)
+        return await sign(payload)
+
+    monkeypatch.setattr(main, "sign_with_tsp_server", counting_sign)
+    name = f"dedup-{os.urandom(4).hex()}"  # not deduplicated against earlier test runs
+    first = {**valid_submission_json, "submission_name": name}
+    second = {**first, "answers": first["answers"][:1]}
+
+    async def submit_concurrently(submission: dict, n: int) -> list[dict]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            responses = await asyncio.gather(*(async_client.post("/submit-ui", data={"content": json.dumps(submission)})
+                                               for _ in range(n)))
+        return [response.json()["response"] for response in responses]
+
+    try:
+        receipts = asyncio.run(submit_concurrently(first, 3))
+        assert len({receipt["signature"] for receipt in receipts}) == 1
+        assert len(signings) == 1
+
+        repeated = client.post("/submit-ui", data={"content": json.dumps(first)}).json()["response"]
+        assert repeated == receipts[0]
+        assert len(signings) == 1
+
+        client.post("/submit-ui", data={"content": json.dumps(second)})
+        again = client.post("/submit-ui", data={"content": json.dumps(first)}).json()["response"]
+        assert again["signature"] != receipts[0]["signature"]
+        assert len(signings) == 3
+    finally:
+        replace_settings(previous)
+
+
+def test_waiting_duplicates_hold_no_slot_and_survive_cancellation(valid_submission_json, monkeypatch):
+    """
+    Duplicates of a submission being signed wait without an admission slot. Cancelling the first submission (the
+    client went away) does not cancel the signing the duplicates wait for.
+    """
+    previous = get_settings()
+    replace_settings(previous.model_copy(update={"submit_dedup_window": 600}))
+    monkeypatch.setattr(main, "admission", AdmissionController(max_in_flight=1, max_queue=0))
+    sign = main.sign_with_tsp_server
+
+    async def slow_sign(payload):
+        await asyncio.sleep(0.2)
+        return await sign(payload)
+
+    monkeypatch.setattr(main, "sign_with_tsp_server", slow_sign)
+    submission = main.AnswerSubmission(**{**valid_submission_json, "submission_name": f"dedup-{os.urandom(4).hex()}"})
+
+    async def submit_and_cancel_first():
+        first = asyncio.create_task(main.process_submission(submission))
+        await asyncio.sleep(0.05)
+        # no queue: a duplicate taking a slot would be rejected while the first one is signed
+        duplicates = [asyncio.create_task(main.process_submission(submission)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await asyncio.gather(*duplicates)
+
+    try:
+        receipts = asyncio.run(submit_and_cancel_first())
+        assert receipts[0] == receipts[1]
+        assert main.admission.stats() == {"in_flight": 0, "queued": 0}
+    finally:
+        replace_settings(previous)
+
+
+def test_receipt_serves_verification_bundle(valid_submission_json):
+    """
+    The submit response is a compact receipt, its URL serves the verification data and result on demand.
+    Without the digest the bundle is not disclosed.
+    """
+    payload = json.dumps({**valid_submission_json, "submission_name": "receipt-test"})
+    response = client.post("/submit-ui", data={"content": payload})
+    assert response.status_code == 200, response.text
+    receipt = response.json()["response"]
+    assert "tsp_verification_data" not in receipt
+
+    bundle = client.get(receipt["receipt_url"])
+    assert bundle.status_code == 200, bundle.text
+    bundle = bundle.json()
+    assert bundle["verification"] == {"verified": True, "timestamp": receipt["time"]}
+    data = bundle["tsp_verification_data"]
+    assert data["submission_digest"] == receipt["submission_digest"]
+    assert hashlib.sha512(data["submission"].encode("utf-8")).hexdigest() == receipt["submission_digest"]
+
+    assert client.get(f"/receipts/{receipt['signature']}").status_code == 404
+    assert client.get(f"/receipts/{receipt['signature']}", params={"digest": "0" * 128}).status_code == 404
+    assert client.get(f"/receipts/{receipt['signature']}", params={"digest": "é"}).status_code == 404
+
+
+def test_receipt_of_legacy_record():
+    """
+    Records stored before canonical digests were hashed over the repr of the submission.
+    """
+    record = {"submission_name": "legacy", "team_email": "test@rag-tat.com", "time": "2025-02-27, 10:00:00",
+              "answers": [{"question_text": "Q?", "kind": "number", "value": 1.0, "references": []}]}
+    submission = {k: record[k] for k in ("team_email", "submission_name", "answers")}
+    assert record_payload(record) == str(submission).encode("utf-8")
+    assert record_payload({**record, "digest_format": "canonical_json"}) == canonical_json(submission)
+
+
+def test_check_token_reuses_validation(valid_submission_json):
+    """
+    Submitting the checked payload with its check token skips parsing and validation, a token of another payload
+    is rejected.
+    """
+    payload = json.dumps({**valid_submission_json, "submission_name": "check-token-test"})
+    check = client.post("/check-submission-ui", data={"content": payload})
+    assert check.status_code == 200
+    check_token = check.json()["check_token"]
+    assert check_token == hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    hits = validation_cache.hits
+    response = client.post("/submit-ui", data={"content": payload, "check_token": check_token})
+    assert response.status_code == 200, response.text
+    assert validation_cache.hits == hits + 1
+
+    response = client.post("/submit", data={"check_token": check_token},
+                           files={"file": ("other.json", json.dumps(valid_submission_json), "application/json")})
+    assert response.status_code == 400
+    assert "check_token" in response.json()["detail"]
+
+    response = client.post("/submit-ui", data={"content": payload, "check_token": "é"})
+    assert response.status_code == 400
+    assert "check_token" in response.json()["detail"]
+
+
+def test_validation_cache_lru_ttl_and_context():
+    cache = ValidationCache(max_entries=2, ttl=60)
+    cache.put("a", "ctx", 1)
+    cache.put("b", "ctx", 2)
+    assert cache.get("a", "ctx") == 1
+    cache.put("c", "ctx", 3)  # evicts b, the least recently used
+    assert cache.get("b", "ctx") is None
+    assert cache.get("a", "other ctx") is None
+    assert cache.stats()["evictions"] == 1
+
+    expired = ValidationCache(max_entries=2, ttl=-1)
+    expired.put("a", "ctx", 1)
+    assert expired.get("a", "ctx") is None
+
+
+def test_metrics_record_stages_and_endpoints(valid_submission_json):
+    """
+    A submission is reflected in the per-endpoint request counters and the per-stage latency histograms.
+    """
+    payload = json.dumps({**valid_submission_json, "submission_name": "metrics-test"})
+    response = client.post("/submit-ui", data={"content": payload})
+    assert response.status_code == 200, response.text
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    metrics = response.text
+    assert 'rag_http_requests_total{endpoint="/submit-ui",method="POST",status="200"}' in metrics
+    for stage in ("parse", "validate", "tsp_sign", "tsp_request", "tsp_verify", "store"):
+        assert f'rag_stage_duration_seconds_count{{stage="{stage}"}}' in metrics
+    assert 'rag_validation_cache_requests_total{result="miss"}' in metrics
+
+
+def test_profile_endpoint_requires_profiling_enabled():
+    previous = get_settings()
+    headers = {"Authorization": "Bearer secret"}
+    replace_settings(previous.model_copy(update={"admin_token": "secret"}))
+    try:
+        assert client.get("/admin/profile", params={"seconds": 0.1}, headers=headers).status_code == 404
+        replace_settings(previous.model_copy(update={"admin_token": "secret", "profiling_enabled": True}))
+        response = client.get("/admin/profile", params={"seconds": 0.1}, headers=headers)
+    finally:
+        replace_settings(previous)
+    assert response.status_code == 200
+    assert "sample_stacks" not in response.text  # the sampling thread itself is excluded
+    assert response.text.strip().endswith(tuple("0123456789"))
+
+
+def test_leaderboard_requires_gold_answers():
+    previous = get_settings()
+    replace_settings(previous.model_copy(update={"admin_token": "secret"}))
+    try:
+        assert client.get("/admin/leaderboard").status_code == 403
+        response = client.get("/admin/leaderboard", headers={"Authorization": "Bearer secret"})
+    finally:
+        replace_settings(previous)
+    assert response.status_code == 404
+
+
+def test_check_submissions_batch(valid_submission_json):
+    """
+    Multiple files are checked in one request, every file gets its own result line and check token.
+    """
+    invalid_email = {**valid_submission_json, "team_email": "invalid-email-format"}
+    files = [("files", ("a.json", json.dumps(valid_submission_json), "application/json")),
+             ("files", ("b.json", json.dumps(invalid_email), "application/json")),
+             ("files", ("c.json", "{not json", "application/json")),
+             ("files", ("d.txt", "{}", "text/plain"))]
+    response = client.post("/check-submissions", files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [(r["index"], r["name"]) for r in results] == [(0, "a.json"), (1, "b.json"), (2, "c.json"), (3, "d.txt")]
+    assert results[0]["check_token"] == hashlib.sha256(json.dumps(valid_submission_json).encode("utf-8")).hexdigest()
+    assert any("INVALID EMAIL ADDRESS" in issue for issue in results[1]["issues"])
+    assert results[2]["status"] == "invalid" and "Invalid JSON" in results[2]["detail"]
+    assert results[3]["status"] == "invalid" and "must be a JSON file" in results[3]["detail"]
+
+    too_many = [("files", (f"{i}.json", "{}", "application/json")) for i in range(get_settings().check_batch_size + 1)]
+    response = client.post("/check-submissions", files=too_many)
+    assert response.status_code == 413
+    assert "Too many submissions" in response.json()["detail"]
+
+
+def test_check_submissions_json_lines(valid_submission_json):
+    lines = [json.dumps({**valid_submission_json, "submission_name": f"variant-{i}"}) for i in range(3)]
+    response = client.post("/check-submissions", content="\n".join(lines) + "\n",
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["name"] for r in results] == ["line 1", "line 2", "line 3"]
+    assert len({r["check_token"] for r in results}) == 3
+
+    assert client.post("/check-submissions", content=b"\n").status_code == 400
+    too_many = "\n".join(lines * get_settings().check_batch_size)
+    response = client.post("/check-submissions", content=too_many)
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert len(results) == get_settings().check_batch_size + 1
+    assert results[-1]["status"] == "invalid" and "Too many submissions" in results[-1]["detail"]
+
+
+def test_check_submissions_json_lines_streamed(valid_submission_json, monkeypatch):
+    """
+    JSON Lines are split as the body arrives: lines spanning several chunks are joined, oversized lines are
+    reported without being buffered.
+    """
+    monkeypatch.setattr(main, "get_settings", lambda: get_settings().model_copy(update={"max_json_size": 10_000}))
+    line = json.dumps(valid_submission_json).encode("utf-8")
+
+    def body():
+        yield line[:100]
+        yield line[100:] + b"\r\n\n" + b"x" * 6_000
+        yield b"x" * 6_000 + b"\n"
+        yield line
+
+    response = client.post("/check-submissions", content=body(), headers={"Content-Type": "application/x-ndjson"})
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["name"] for r in results] == ["line 1", "line 3", "line 4"]
+    assert results[0]["check_token"] == results[2]["check_token"] == hashlib.sha256(line).hexdigest()
+    assert results[1]["status"] == "invalid" and "too large" in results[1]["detail"]
@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from src.merkle import MerkleBatcher, merkle_levels, merkle_proof, root_from_proof
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 8])
+def test_inclusion_proofs_lead_to_root(n):
+    """
+    Every leaf must recompute the root from its proof, also for odd numbers of leaves.
+    """
+    digests = [hashlib.sha512(str(i).encode()).digest() for i in range(n)]
+    levels = merkle_levels(digests)
+    root = levels[-1][0]
+    for idx, digest in enumerate(digests):
+        assert root_from_proof(digest, merkle_proof(levels, idx)) == root
+
+
+def test_proof_rejects_other_digest():
+    digests = [hashlib.sha512(str(i).encode()).digest() for i in range(4)]
+    levels = merkle_levels(digests)
+    assert root_from_proof(digests[1], merkle_proof(levels, 0)) != levels[-1][0]
+
+
+class FakeSigningPool:
+    def __init__(self):
+        self.signed = []
+
+    async def sign(self, digest: bytes):
+        self.signed.append(digest)
+        return b"token", None
+
+
+def test_batcher_signs_one_root_per_batch():
+    """
+    Submissions arriving within the window share one TSP round trip over the Merkle root.
+    """
+    pool = FakeSigningPool()
+    batcher = MerkleBatcher(pool, window=0.05, max_size=10)
+    digests = [hashlib.sha512(str(i).encode()).digest() for i in range(3)]
+
+    async def submit_all():
+        return await asyncio.gather(*(batcher.sign(digest) for digest in digests))
+
+    results = asyncio.run(submit_all())
+    assert len(pool.signed) == 1
+    for digest, (token, _, merkle) in zip(digests, results):
+        assert token == b"token"
+        assert root_from_proof(digest, merkle["merkle_proof"]).hex() == merkle["merkle_root"]
+        assert bytes.fromhex(merkle["merkle_root"]) == pool.signed[0]
+
+
+def test_batcher_drain_signs_pending_batch():
+    """
+    On shutdown the pending digests are signed without waiting for the window.
+    """
+    pool = FakeSigningPool()
+    batcher = MerkleBatcher(pool, window=60, max_size=10)
+
+    async def sign_and_drain():
+        signing = asyncio.ensure_future(batcher.sign(hashlib.sha512(b"0").digest()))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(batcher.drain(), timeout=1)
+        return signing.done()
+
+    assert asyncio.run(sign_and_drain())
+    assert len(pool.signed) == 1
@@ -0,0 +1,111 @@
+import pytest
+
+from src.canonical import canonical_json
+from src.questions import QuestionCatalogue
+from src.scoring import GoldAnswers, Leaderboard
+from src.storage import JsonDirectoryStore, SQLiteStore
+from src.submissions_index import SubmissionsIndex
+
+QUESTIONS = [{"text": "How many employees?", "kind": "number"},
+             {"text": "Which company is larger?", "kind": "name"},
+             {"text": "Which companies are listed?", "kind": "names"},
+             {"text": "Was there a buyback?", "kind": "boolean"},
+             {"text": "What is the revenue?", "kind": "number"}]
+
+GOLD = [{"question_text": "How many employees?", "value": 1000,
+         "references": [{"pdf_sha1": "a", "page_index": 1}, {"pdf_sha1": "a", "page_index": 2}]},
+        {"question_text": "Which company is larger?", "value": ["Acme Corp", "ACME"]},
+        {"question_text": "Which companies are listed?", "value": ["Acme Corp", "Globex", "Initech"]},
+        {"question_text": "Was there a buyback?", "value": False},
+        {"question_text": "What is the revenue?", "value": "N/A"}]
+
+
+@pytest.fixture
+def gold():
+    return GoldAnswers(GOLD, QuestionCatalogue(QUESTIONS))
+
+
+def record(answers: list, submission_name="exp", time="2025-02-27, 10:00:00", signature="s1") -> dict:
+    return {"team_email": "test@rag-tat.com", "submission_name": submission_name, "time": time,
+            "signature": signature, "tsp_signature": "00", "submission_digest": "ff",
+            "answers": [{"question_text": q["text"], "value": v, "references": r} for q, (v, r) in
+                        zip(QUESTIONS, answers)]}
+
+
+def test_score_by_kind(gold):
+    perfect = record([(1005, [{"pdf_sha1": "a", "page_index": 1}, {"pdf_sha1": "a", "page_index": 2}]),
+                      (" acme  corp", []), (["Initech", "Globex", "acme corp"], []), (False, []), ("N/A", [])])
+    partial = record([(1100, [{"pdf_sha1": "a", "page_index": 1}, {"pdf_sha1": "b", "page_index": 1}]),
+                      ("Globex", []), (["Acme Corp", "Globex", "Umbrella"], []), ("false", []), (42, [])])
+    empty = record([])
+
+    scores = gold.score([perfect, partial, empty])
+    assert scores[0] == {"score": 5.25, "value_score": 5.0, "reference_score": 1.0, "answered": 5}
+    # number outside the tolerance, wrong name, 2 of 4 names, correct boolean, N/A expected; 1 of 2 pages
+    assert scores[1] == {"score": 1.625, "value_score": 1.5, "reference_score": 0.5, "answered": 5}
+    assert scores[2] == {"score": 0.0, "value_score": 0.0, "reference_score": 0.0, "answered": 0}
+
+
+def test_gold_answers_must_match_questions():
+    with pytest.raises(ValueError):
+        GoldAnswers([{"question_text": "Unknown question?", "value": 1}], QuestionCatalogue(QUESTIONS))
+
+
+def test_leaderboard_updates_incrementally(gold, tmp_path):
+    """
+    Submissions stored after the first ranking are scored on their own, an overwritten submission is replaced.
+    """
+    store = SQLiteStore(str(tmp_path / "submissions.sqlite3"))
+    index = SubmissionsIndex(store)
+    leaderboard = Leaderboard(store, gold)
+    index.subscribe(leaderboard.notify)
+
+    def submit(rec: dict):
+        metadata = {k: rec[k] for k in ("time", "signature", "tsp_signature", "submission_digest")}
+        payload = canonical_json({k: rec[k] for k in ("team_email", "submission_name", "answers")})
+        index.add(store.add(metadata, payload, rec["team_email"], rec["submission_name"]))
+
+    submit(record([(1000, [])], submission_name="first"))
+    assert [(e["submission_name"], e["score"]) for e in leaderboard.ranking()] == [("first", 1.0)]
+
+    scored = []
+    original_score = gold.score
+    gold.score = lambda records: scored.append(len(records)) or original_score(records)
+    submit(record([(1000, []), ("ACME", [])], submission_name="second", time="2025-02-27, 10:00:01",
+                  signature="s2"))
+    submit(record([], submission_name="first", time="2025-02-27, 10:00:02", signature="s3"))
+
+    ranking = leaderboard.ranking()
+    assert scored == [2]
+    assert [(e["submission_name"], e["score"], e["signature"]) for e in ranking] == [("second", 2.0, "s2"),
+                                                                                    ("first", 0.0, "s3")]
+    assert leaderboard.ranking() is ranking  # unchanged, no scoring
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_leaderboard_same_second_overwrite(gold, tmp_path, backend):
+    """
+    Of two submissions within the same second the later stored one is ranked, like in the submissions table, both
+    when it is scored incrementally and when everything is scored at once.
+    """
+    if backend == "sqlite":
+        store = SQLiteStore(str(tmp_path / "submissions.sqlite3"))
+    else:
+        store = JsonDirectoryStore(str(tmp_path))
+    index = SubmissionsIndex(store)
+    leaderboard = Leaderboard(store, gold)
+    index.subscribe(leaderboard.notify)
+
+    def submit(rec: dict):
+        metadata = {k: rec[k] for k in ("time", "signature", "tsp_signature", "submission_digest")}
+        payload = canonical_json({k: rec[k] for k in ("team_email", "submission_name", "answers")})
+        index.add(store.add(metadata, payload, rec["team_email"], rec["submission_name"]))
+
+    # the later submission sorts first by signature
+    submit(record([], signature="b" * 64))
+    assert [e["signature"] for e in leaderboard.ranking()] == ["b" * 64]
+    submit(record([(1000, [])], signature="a" * 64))
+
+    assert index.current("test@rag-tat.com", "exp")["signature"] == "a" * 64
+    assert [(e["signature"], e["score"]) for e in leaderboard.ranking()] == [("a" * 64, 1.0)]
+    assert [(e["signature"], e["score"]) for e in Leaderboard(store, gold).ranking()] == [("a" * 64, 1.0)]
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import uvicorn
+from dotenv import dotenv_values
+
+from src import serve, settings
+
+
+def test_workers_reload_edited_dotenv(monkeypatch, tmp_path):
+    """
+    The supervisor reads .env without copying it into the environment the workers inherit, otherwise the inherited
+    values would take precedence over the edited .env on POST /admin/reload-settings.
+    """
+    for name in dotenv_values():
+        monkeypatch.delenv(name, raising=False)
+    environ = dict(os.environ)
+    monkeypatch.setattr(serve, "prepare", lambda settings: 1)
+    monkeypatch.setattr(uvicorn, "run", lambda *args, **kwargs: None)
+    monkeypatch.setattr(sys, "argv", ["serve", "--workers", "2"])
+    serve.main()
+    assert dict(os.environ) == environ
+
+    # a worker captures the inherited environment at import, then .env is edited
+    monkeypatch.setattr(settings, "_process_environ", dict(os.environ))
+    dotenv = tmp_path / ".env"
+    dotenv.write_text("CORRECT_QUESTIONS_PATH=questions.json\nSUBMISSIONS_PATH=submissions\nMAX_JSON_SIZE=123\n")
+    assert settings.load_settings(str(dotenv)).max_json_size == 123
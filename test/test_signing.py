@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from src.signing import TSPSigningPool, TSPTimeoutError
+from test.tsp_server import LocalTSPServer
+
+
+@pytest.fixture
+def slow_tsp_server():
+    server = LocalTSPServer(latency=0.5).start()
+    yield server
+    server.stop()
+
+
+def test_signing_pool_times_out(slow_tsp_server):
+    """
+    A slow TSP server must fail the signing after the configured timeout instead of blocking indefinitely.
+    """
+    pool = TSPSigningPool(slow_tsp_server.url, max_concurrency=2, timeout=0.1,
+                          ca_pem_file=slow_tsp_server.ca_pem_file)
+    with pytest.raises(TSPTimeoutError):
+        asyncio.run(pool.sign(hashlib.sha512(b"submission").digest()))
+    pool.shutdown()
+
+
+def test_signing_pool_keeps_event_loop_responsive(slow_tsp_server):
+    """
+    Concurrent signings run in the pool, the event loop keeps serving other tasks in the meantime.
+    """
+    pool = TSPSigningPool(slow_tsp_server.url, max_concurrency=4, timeout=5,
+                          ca_pem_file=slow_tsp_server.ca_pem_file)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(asyncio.get_running_loop().time())
+            await asyncio.sleep(0.05)
+
+    async def run():
+        digests = [hashlib.sha512(str(i).encode()).digest() for i in range(4)]
+        results, _ = await asyncio.gather(asyncio.gather(*(pool.sign(d) for d in digests)), ticker())
+        return results
+
+    results = asyncio.run(run())
+    assert len(results) == 4
+    assert len(ticks) == 5 and ticks[-1] - ticks[0] < 0.45
+    pool.shutdown()
+
+
+def test_signing_verifies_token_once(monkeypatch):
+    """
+    The token is verified by the signer against the configured trust roots, its result is returned as is.
+    """
+    server = LocalTSPServer().start()
+    try:
+        pool = TSPSigningPool(server.url, ca_pem_file=server.ca_pem_file)
+        calls = []
+        verify = pool._verifier.verify
+        monkeypatch.setattr(pool._verifier, "verify",
+                            lambda *args, **kwargs: calls.append(kwargs) or verify(*args, **kwargs))
+        digest = hashlib.sha512(b"submission").digest()
+        token, verified = pool.sign_blocking(digest)
+        pool.shutdown()
+    finally:
+        server.stop()
+    assert len(calls) == 1 and calls[0]["nonce"]  # the signer's check of the nonce
+    assert verified.tst_info["message_imprint"]["hashed_message"] == digest
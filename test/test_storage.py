@@ -0,0 +1,102 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.canonical import canonical_json
+from src.storage import JsonDirectoryStore, SQLiteStore, SubmissionStore, import_json_directory
+
+
+def add(store, signature: str, time: str, team_email="test@rag-tat.com", submission_name="test-team", digest="ff"):
+    metadata = {"time": time, "signature": signature, "tsp_signature": "00", "submission_digest": digest}
+    payload = canonical_json({"answers": [], "submission_name": submission_name, "team_email": team_email})
+    return store.add(metadata, payload, team_email, submission_name)
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStore(str(tmp_path / "submissions.sqlite3"))
+    return JsonDirectoryStore(str(tmp_path))
+
+
+def test_latest_per_team_and_name(store):
+    add(store, "a" * 64, "2025-02-27, 10:00:00")
+    add(store, "b" * 64, "2025-02-27, 10:00:01")
+    add(store, "c" * 64, "2025-02-27, 10:00:02", submission_name="other")
+
+    assert store.latest("test@rag-tat.com", "test-team")["signature"] == "b" * 64
+    assert store.get("a" * 64)["time"] == "2025-02-27, 10:00:00"
+    assert store.get("d" * 64) is None
+    # the log is append-only, overwritten records stay available
+    assert [r["signature"][0] for r in store.iter_records()] == ["a", "b", "c"]
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class ReadOnlyStore(SubmissionStore):
+        def get(self, signature):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnlyStore()
+
+
+def test_find_by_digest(store):
+    add(store, "a" * 64, "2025-02-27, 10:00:00", digest="aa")
+    add(store, "b" * 64, "2025-02-27, 10:00:01", digest="bb")
+    add(store, "c" * 64, "2025-02-27, 10:00:02", digest="aa")
+    add(store, "d" * 64, "2025-02-27, 10:00:03", submission_name="other", digest="aa")
+
+    assert store.find("aa", "test@rag-tat.com", "test-team")["signature"] == "c" * 64
+    assert store.find("bb", "test@rag-tat.com", "other") is None
+    assert store.find("cc", "test@rag-tat.com", "test-team") is None
+
+
+def test_json_find_sees_records_of_other_workers(tmp_path):
+    """
+    Digest lookups are answered from memory, records added by another process are read once on the next lookup.
+    """
+    worker_1, worker_2 = JsonDirectoryStore(str(tmp_path)), JsonDirectoryStore(str(tmp_path))
+    add(worker_1, "a" * 64, "2025-02-27, 10:00:00", digest="aa")
+    assert worker_2.find("aa", "test@rag-tat.com", "test-team")["signature"] == "a" * 64
+
+    add(worker_1, "b" * 64, "2025-02-27, 10:00:01", digest="aa")
+    assert worker_2.find("aa", "test@rag-tat.com", "test-team")["signature"] == "b" * 64
+    assert worker_2._indexed == set(worker_2._files())
+
+
+def test_sqlite_poll_sees_writes_of_other_connections(tmp_path):
+    """
+    Two store instances on the same database (as in two workers) see each other's appended records.
+    """
+    path = str(tmp_path / "submissions.sqlite3")
+    worker_1, worker_2 = SQLiteStore(path), SQLiteStore(path)
+    assert worker_2.poll() == []
+    add(worker_1, "a" * 64, "2025-02-27, 10:00:00")
+    assert [row["signature"] for row in worker_2.poll()] == ["a" * 64]
+    assert worker_2.poll() == []
+
+
+def test_sqlite_concurrent_polls_return_rows_once(tmp_path):
+    """
+    Polls from several threads (as from the threadpool) neither repeat nor skip rows.
+    """
+    store = SQLiteStore(str(tmp_path / "submissions.sqlite3"))
+    for i in range(200):
+        add(store, f"{i:064d}", "2025-02-27, 10:00:00", submission_name=f"exp-{i}")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        polled = [row["signature"] for rows in pool.map(lambda _: store.poll(), range(16)) for row in rows]
+    assert sorted(polled) == [f"{i:064d}" for i in range(200)]
+
+
+def test_import_json_directory(tmp_path):
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    record = {"submission_name": "legacy", "team_email": "test@rag-tat.com", "time": "2025-02-27, 10:00:00",
+              "signature": "a" * 64, "tsp_signature": "00", "submission_digest": "ff", "answers": []}
+    (json_dir / "2025-02-27-10-00-00_legacy.json").write_text(json.dumps(record, indent=4), encoding="utf-8")
+
+    store = SQLiteStore(str(tmp_path / "submissions.sqlite3"))
+    assert import_json_directory(str(json_dir), store) == (1, 0)
+    assert import_json_directory(str(json_dir), store) == (0, 1)
+    assert store.latest("test@rag-tat.com", "legacy") == record
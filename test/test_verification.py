@@ -0,0 +1,85 @@
+import hashlib
+import json
+
+import pytest
+
+from src.canonical import DIGEST_FORMAT, canonical_json
+from src.merkle import merkle_levels, merkle_proof
+from src.signing import TSPSigningPool
+from src.storage import SQLiteStore
+from src.verification import verify_archive
+from test.tsp_server import LocalTSPServer
+
+
+@pytest.fixture(scope="module")
+def tsp_server():
+    server = LocalTSPServer().start()
+    yield server
+    server.stop()
+
+
+def signed_record(pool: TSPSigningPool, submission_name: str, value) -> dict:
+    payload = {"team_email": "test@rag-tat.com", "submission_name": submission_name,
+               "answers": [{"question_text": "Q?", "kind": "number", "value": value, "references": []}]}
+    digest = hashlib.sha512(canonical_json(payload)).digest()
+    token, verified = pool.sign_blocking(digest)
+    return {**payload, "time": verified.tst_info["gen_time"].strftime("%Y-%m-%d, %H:%M:%S"),
+            "signature": hashlib.sha256(token.hex().encode("utf-8")).hexdigest()[:64],
+            "tsp_signature": token.hex(), "submission_digest": digest.hex(), "digest_format": DIGEST_FORMAT}
+
+
+def test_verify_archive_reports_tampered_records(tsp_server, tmp_path):
+    """
+    Intact records (canonical, legacy and batched) verify, records whose answers or token were changed are reported.
+    """
+    pool = TSPSigningPool(tsp_server.url, ca_pem_file=tsp_server.ca_pem_file)
+    records = [signed_record(pool, f"exp-{i}", i) for i in range(4)]
+
+    legacy = {k: v for k, v in signed_record(pool, "legacy", 1.0).items() if k != "digest_format"}
+    legacy_payload = {k: legacy[k] for k in ("team_email", "submission_name", "answers")}
+    legacy_digest = hashlib.sha512(str(legacy_payload).encode("utf-8")).digest()
+    token, verified = pool.sign_blocking(legacy_digest)
+    legacy.update(tsp_signature=token.hex(), submission_digest=legacy_digest.hex(),
+                  time=verified.tst_info["gen_time"].strftime("%Y-%m-%d, %H:%M:%S"),
+                  signature=hashlib.sha256(token.hex().encode("utf-8")).hexdigest()[:64])
+
+    batched = signed_record(pool, "batched", 2)
+    digest = bytes.fromhex(batched["submission_digest"])
+    levels = merkle_levels([digest, hashlib.sha512(b"other submission").digest()])
+    token, verified = pool.sign_blocking(levels[-1][0])
+    batched.update(tsp_signature=token.hex(), time=verified.tst_info["gen_time"].strftime("%Y-%m-%d, %H:%M:%S"),
+                   merkle_root=levels[-1][0].hex(), merkle_proof=merkle_proof(levels, 0),
+                   signature=hashlib.sha256((token.hex() + digest.hex()).encode("utf-8")).hexdigest()[:64])
+    pool.shutdown()
+
+    records[1]["answers"][0]["value"] = 42  # tampered answers
+    records[2]["tsp_signature"] = records[3]["tsp_signature"]  # token of another submission
+
+    store = SQLiteStore(str(tmp_path / "submissions.sqlite3"))
+    for record in records + [legacy, batched]:
+        # keeps the key order of the answers, the legacy digest depends on it
+        store.insert(json.dumps(record).encode("utf-8"), record, record["submission_digest"])
+
+    report = verify_archive(store.iter_records(), ca_pem_file=tsp_server.ca_pem_file, workers=2, chunk_size=2)
+    assert report["total"] == 6
+    assert report["verified"] == 4
+    failed = {f["submission_name"]: f["error"] for f in report["failures"]}
+    assert failed.keys() == {"exp-1", "exp-2"}
+    assert "does not match the submission digest" in failed["exp-1"]
+    assert "Signature does not match" in failed["exp-2"]
+
+
+def test_verify_archive_rejects_untrusted_tsa(tsp_server):
+    """
+    Tokens of a TSA outside the trust roots fail verification.
+    """
+    pool = TSPSigningPool(tsp_server.url, ca_pem_file=tsp_server.ca_pem_file)
+    record = signed_record(pool, "untrusted", 1)
+    pool.shutdown()
+
+    other = LocalTSPServer().start()
+    try:
+        report = verify_archive([record], ca_pem_file=other.ca_pem_file, workers=1)
+    finally:
+        other.stop()
+    assert report["failed"] == 1
@@ -0,0 +1,175 @@
+"""
+Offline stand-in for an RFC 3161 timestamp authority (TSP server).
+
+Issues timestamp tokens signed by a throwaway TSA certificate of a self-signed CA, with configurable artificial
+latency and error rate. Tokens verify with tsp_client's TSPVerifier when the CA file is used as trust root
+(TSP_CA_FILE). Used by the tests and the benchmark suite, or standalone:
+
+    python -m test.tsp_server --port 8318 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import hashlib
+import os
+import random
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from asn1crypto import cms, tsp, x509 as asn1_x509
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+TSA_POLICY = "1.3.6.1.4.1.4146.2.3"
+
+
+def _make_certificate(subject: str, key, issuer: str, issuer_key, is_ca: bool) -> x509.Certificate:
+    now = datetime.now(timezone.utc)
+    builder = (x509.CertificateBuilder()
+               .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, subject)]))
+               .issuer_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, issuer)]))
+               .public_key(key.public_key())
+               .serial_number(x509.random_serial_number())
+               .not_valid_before(now - timedelta(days=1))
+               .not_valid_after(now + timedelta(days=30))
+               .add_extension(x509.BasicConstraints(ca=is_ca, path_length=None), critical=True))
+    if is_ca:
+        builder = builder.add_extension(
+            x509.KeyUsage(digital_signature=False, content_commitment=False, key_encipherment=False,
+                          data_encipherment=False, key_agreement=False, key_cert_sign=True, crl_sign=True,
+                          encipher_only=False, decipher_only=False), critical=True)
+    else:
+        builder = builder.add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.TIME_STAMPING]), critical=True)
+    return builder.sign(issuer_key, hashes.SHA256())
+
+
+class LocalTSA:
+    """Self-signed CA plus TSA certificate, answering DER encoded TimeStampReq with TimeStampResp."""
+
+    def __init__(self):
+        ca_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.ca_cert = _make_certificate("Local Test TSP CA", ca_key, "Local Test TSP CA", ca_key, is_ca=True)
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        tsa_cert = _make_certificate("Local Test TSA", self._key, "Local Test TSP CA", ca_key, is_ca=False)
+        self._tsa_cert = asn1_x509.Certificate.load(tsa_cert.public_bytes(serialization.Encoding.DER))
+
+    def ca_pem(self) -> bytes:
+        return self.ca_cert.public_bytes(serialization.Encoding.PEM)
+
+    def respond(self, request_der: bytes) -> bytes:
+        request = tsp.TimeStampReq.load(request_der)
+        tst_info = {
+            "version": "v1",
+            "policy": TSA_POLICY,
+            "message_imprint": request["message_imprint"],
+            "serial_number": secrets.randbits(63),
+            "gen_time": datetime.now(timezone.utc).replace(microsecond=0),
+        }
+        if request["nonce"].native is not None:
+            tst_info["nonce"] = request["nonce"].native
+        tst_info = tsp.TSTInfo(tst_info)
+
+        signed_attrs = cms.CMSAttributes([
+            cms.CMSAttribute({"type": "content_type", "values": ["tst_info"]}),
+            cms.CMSAttribute({"type": "message_digest", "values": [hashlib.sha256(tst_info.dump()).digest()]}),
+            cms.CMSAttribute({"type": "signing_certificate_v2", "values": [
+                {"certs": [{"cert_hash": hashlib.sha256(self._tsa_cert.dump()).digest()}]}]}),
+        ])
+        signature = self._key.sign(signed_attrs.dump(), padding.PKCS1v15(), hashes.SHA256())
+
+        signed_data = cms.SignedData({
+            "version": "v3",
+            "digest_algorithms": [{"algorithm": "sha256"}],
+            "encap_content_info": {"content_type": "tst_info", "content": tst_info},
+            "certificates": [self._tsa_cert],
+            "signer_infos": [{
+                "version": "v1",
+                "sid": {"issuer_and_serial_number": {"issuer": self._tsa_cert.issuer,
+                                                     "serial_number": self._tsa_cert.serial_number}},
+                "digest_algorithm": {"algorithm": "sha256"},
+                "signed_attrs": signed_attrs,
+                "signature_algorithm": {"algorithm": "rsassa_pkcs1v15"},
+                "signature": signature,
+            }],
+        })
+        token = cms.ContentInfo({"content_type": "signed_data", "content": signed_data})
+        return tsp.TimeStampResp({"status": {"status": "granted"}, "time_stamp_token": token}).dump()
+
+
+class LocalTSPServer:
+    """Threaded HTTP server in front of a LocalTSA, with artificial latency (seconds) and error rate (0..1)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, error_rate: float = 0.0):
+        self.tsa = LocalTSA()
+        self.latency = latency
+        self.error_rate = error_rate
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+        fd, self.ca_pem_file = tempfile.mkstemp(prefix="local_tsp_ca_", suffix=".pem")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.tsa.ca_pem())
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if server.latency:
+                    time.sleep(server.latency)
+                if random.random() < server.error_rate:
+                    self.send_error(503, "Injected TSP error")
+                    return
+                response = server.tsa.respond(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/timestamp-reply")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "LocalTSPServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        os.remove(self.ca_pem_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RFC 3161 test TSP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8318)
+    parser.add_argument("--latency", type=float, default=0.0, help="artificial latency per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args()
+
+    server = LocalTSPServer(args.host, args.port, args.latency, args.error_rate).start()
+    print(f"TSP_URL={server.url}")
+    print(f"TSP_CA_FILE={server.ca_pem_file}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()